@@ -0,0 +1,50 @@
+"""
+Benchmark del anillo de clips (modules.clips).
+
+Mide el costo de append() en el hilo de captura, los segundos que caben en
+la memoria fija del anillo y el costo de escribir un clip a disco.
+
+Uso:
+    python -m benchmarks.bench_clips --fps 15 --frame-kb 60
+"""
+import argparse
+import os
+import tempfile
+import time
+from unittest import mock
+from modules.clips import ClipBuffer, ClipWriter
+from config import CLIP_BUFFER_BYTES, CLIP_INDEX_SLOTS, CLIP_PRE_SECONDS, CLIP_POST_SECONDS
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fps", type=float, default=15)
+    parser.add_argument("--frame-kb", type=int, default=60)
+    parser.add_argument("--seconds", type=int, default=60)
+    args = parser.parse_args()
+
+    buffer = ClipBuffer(CLIP_BUFFER_BYTES, CLIP_INDEX_SLOTS)
+    frame = os.urandom(args.frame_kb * 1024)
+    total_frames = int(args.fps * args.seconds)
+    start = time.time() - args.seconds
+
+    t0 = time.perf_counter()
+    for i in range(total_frames):
+        buffer.append(frame, start + i / args.fps)
+    append_us = (time.perf_counter() - t0) / total_frames * 1e6
+
+    stats = buffer.stats()
+    print(f"append: {append_us:.1f} µs/frame ({args.frame_kb} KB)")
+    print(f"memoria fija: {CLIP_BUFFER_BYTES / 1e6:.0f} MB → {stats['buffered_seconds']} s en el anillo")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = ClipWriter("bench", buffer, tmp, CLIP_PRE_SECONDS, CLIP_POST_SECONDS, 1)
+        event_time = start + args.seconds - CLIP_POST_SECONDS
+        # Sin base de datos: sólo se mide copia + escritura del archivo
+        with mock.patch("modules.clips.storage.set_event_clip"):
+            writer._write(1, event_time)
+        print(f"clip de {CLIP_PRE_SECONDS + CLIP_POST_SECONDS} s: {writer.last_write_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark de la exportación de eventos (/events/export).
+
+Crea una base temporal con N eventos y mide el throughput y el pico de
+memoria de la exportación en CSV y NDJSON, con y sin gzip.
+
+Uso:
+    python -m benchmarks.bench_export --rows 1000000
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from modules import storage, export
+
+
+def populate(rows: int):
+    conn = sqlite3.connect(storage.DB_PATH)
+    start = datetime(2025, 1, 1)
+
+    def _rows():
+        for i in range(rows):
+            ts = (start + timedelta(seconds=i)).isoformat()
+            yield (i % 500, "entered" if i % 2 == 0 else "exited", ts, f"cam{i % 4}")
+
+    conn.executemany(
+        "INSERT INTO events (person_id, action, timestamp, camera_id) VALUES (?, ?, ?, ?)",
+        _rows(),
+    )
+    conn.commit()
+    conn.close()
+
+
+def run(fmt: str, compress: bool, rows: int):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    total_bytes = sum(len(chunk) for chunk in export.stream_events(fmt, compress))
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{fmt:>6} gzip={str(compress):<5} | {rows / elapsed:>10,.0f} filas/s | "
+        f"{total_bytes / elapsed / 1e6:>7.1f} MB/s | {total_bytes / 1e6:>8.1f} MB | "
+        f"pico memoria {peak / 1e6:.1f} MB"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.DB_PATH = os.path.join(tmp, "bench.db")
+        storage.init_db()
+        populate(args.rows)
+        for fmt in ("csv", "ndjson"):
+            for compress in (False, True):
+                run(fmt, compress, args.rows)
+
+
+if __name__ == "__main__":
+    main()
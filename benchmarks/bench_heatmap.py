@@ -0,0 +1,69 @@
+"""
+Benchmark de los agregados horarios (modules.heatmap).
+
+Mide el costo de add_point() en el hilo de captura, el tamaño persistido
+por hora y el tiempo de armar el mapa de calor y el tráfico por hora para
+rangos de 1 hora, 1 día y 1 mes.
+
+Uso:
+    python -m benchmarks.bench_heatmap
+"""
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from modules import storage, heatmap
+from config import HEATMAP_GRID_ROWS, HEATMAP_GRID_COLS
+
+CAMERA_ID = "cam0"
+
+
+def populate(days: int):
+    """Genera agregados por hora y su acumulado diario, como los escribe el worker"""
+    rng = np.random.default_rng(0)
+    start = datetime(2025, 1, 1)
+    sizes = []
+    for d in range(days):
+        day_grid = np.zeros((HEATMAP_GRID_ROWS, HEATMAP_GRID_COLS), dtype=np.uint32)
+        for h in range(24):
+            grid = rng.poisson(3, (HEATMAP_GRID_ROWS, HEATMAP_GRID_COLS)).astype(np.uint32)
+            day_grid += grid
+            blob = heatmap.encode_grid(grid)
+            sizes.append(len(blob))
+            hour = (start + timedelta(days=d, hours=h)).strftime("%Y-%m-%dT%H")
+            storage.save_traffic("hour", CAMERA_ID, hour, 10, 10, blob, HEATMAP_GRID_ROWS, HEATMAP_GRID_COLS)
+        day = (start + timedelta(days=d)).date().isoformat()
+        storage.save_traffic("day", CAMERA_ID, day, 240, 240, heatmap.encode_grid(day_grid),
+                             HEATMAP_GRID_ROWS, HEATMAP_GRID_COLS)
+    return sum(sizes) / len(sizes)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.DB_PATH = os.path.join(tmp, "bench.db")
+        storage.init_db()
+
+        accumulator = heatmap.HourlyAccumulator(CAMERA_ID, HEATMAP_GRID_ROWS, HEATMAP_GRID_COLS, 60)
+        n = 100_000
+        t0 = time.perf_counter()
+        for i in range(n):
+            accumulator.add_point(i % 640, i % 480, 640, 480)
+        print(f"add_point: {(time.perf_counter() - t0) / n * 1e6:.2f} µs/centroide")
+
+        avg_blob = populate(31)
+        print(f"grilla {HEATMAP_GRID_ROWS}x{HEATMAP_GRID_COLS}: {avg_blob / 1024:.1f} KB por hora comprimida")
+
+        for label, end in (("1 hora", "2025-01-01T01"), ("1 día", "2025-01-02"), ("1 mes", "2025-02-01")):
+            t0 = time.perf_counter()
+            _, grids = heatmap.load_heatmap(CAMERA_ID, "2025-01-01", end)
+            heatmap_ms = (time.perf_counter() - t0) * 1000
+            t0 = time.perf_counter()
+            heatmap.load_hourly_traffic(CAMERA_ID, "2025-01-01", end)
+            hourly_ms = (time.perf_counter() - t0) * 1000
+            print(f"{label:>7}: mapa de calor {heatmap_ms:.1f} ms ({grids} grillas) | "
+                  f"tráfico por hora {hourly_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
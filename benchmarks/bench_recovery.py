@@ -0,0 +1,73 @@
+"""
+Benchmark de la recuperación de contadores tras un reinicio.
+
+Para historiales de distinto tamaño guarda un checkpoint, escribe unos
+eventos posteriores (los que se perderían con un kill) y mide cuánto tarda
+restore_counters. El tiempo debe mantenerse constante al crecer el historial.
+
+Uso:
+    python -m benchmarks.bench_recovery --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+from modules import storage, checkpoint
+
+CAMERA_ID = "cam0"
+
+
+def insert_events(conn, first: int, count: int):
+    start = datetime(2025, 1, 1)
+    conn.executemany(
+        "INSERT INTO events (person_id, action, timestamp, camera_id) VALUES (?, ?, ?, ?)",
+        (
+            (i % 500, "entered" if i % 2 == 0 else "exited",
+             (start + timedelta(seconds=i)).isoformat(), CAMERA_ID)
+            for i in range(first, first + count)
+        ),
+    )
+    conn.commit()
+
+
+def run(history: int, tail: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.DB_PATH = os.path.join(tmp, "bench.db")
+        storage.init_db()
+        conn = sqlite3.connect(storage.DB_PATH)
+
+        insert_events(conn, 0, history)
+        entered = (history + 1) // 2
+        exited = history // 2
+        counters = {"inside": entered - exited, "entered": entered, "exited": exited}
+        last_event_id = conn.execute("SELECT MAX(id) FROM events").fetchone()[0]
+        storage.save_checkpoint(CAMERA_ID, counters, last_event_id, {})
+
+        # Eventos escritos después del último checkpoint (antes del "kill")
+        insert_events(conn, history, tail)
+        conn.close()
+
+        t0 = time.perf_counter()
+        restored, _, _ = checkpoint.restore_counters(CAMERA_ID)
+        elapsed_ms = (time.perf_counter() - t0) * 1000
+
+        total = history + tail
+        assert restored["entered"] == (total + 1) // 2
+        assert restored["exited"] == total // 2
+        print(f"historial {history:>10,} | posteriores {tail:>5} | recuperación {elapsed_ms:>7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--tail", type=int, default=100)
+    args = parser.parse_args()
+
+    for history in args.sizes:
+        run(history, args.tail)
+
+
+if __name__ == "__main__":
+    main()
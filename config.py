@@ -10,6 +10,61 @@ DB_PATH = DATA_DIR / "sismonicamaras.db"
 # Parámetros de aforo
 MAX_CAPACITY = 50
 
+# Cámaras
+DEFAULT_CAMERA_ID = "cam0"
+CAMERAS = {DEFAULT_CAMERA_ID: 0}  # camera_id -> fuente de cv2.VideoCapture
+MODEL_PATH = "yolov8n.pt"
+
+# Supervisor de cámara (reconexión y watchdog)
+CAMERA_BASE_BACKOFF = 1.0  # segundos antes del primer reintento
+CAMERA_MAX_BACKOFF = 16.0  # tope del backoff exponencial
+CAMERA_STALL_SECONDS = 5.0  # sin frames nuevos (o congelados) → reconectar
+CAMERA_WATCHDOG_INTERVAL = 0.5
+
+# Proceso de inferencia (worker) y comunicación con la API
+EMBEDDED_WORKER = True  # la API lanza (y relanza) worker.py si no está corriendo; False → correrlo aparte
+WORKER_CONTROL_ADDRESS = ("127.0.0.1", 6001)  # canal IPC de comandos
+# Clave HMAC del canal IPC: de la variable de entorno o, si no está, de un
+# archivo privado (0600) generado al primer arranque. Nunca fija en el código.
+WORKER_AUTHKEY_ENV = "SISMONICAMARAS_WORKER_KEY"
+WORKER_AUTHKEY_FILE = DATA_DIR / "worker.key"
+WORKER_HEARTBEAT_TIMEOUT = 5  # segundos sin latido → worker caído
+FRAME_RING_SLOTS = 8  # frames JPEG retenidos en memoria compartida por cámara
+FRAME_SLOT_BYTES = 1_000_000  # tamaño máximo de un JPEG en el anillo
+
+# Renditions del video: "full" siempre se codifica (clips y snapshots);
+# las demás sólo mientras algún visor esté suscrito
+RENDITIONS = {
+    "full": {"scale": 1.0, "quality": 95, "max_fps": None},
+    "medium": {"scale": 0.5, "quality": 70, "max_fps": 10},
+    "low": {"scale": 0.25, "quality": 50, "max_fps": 2},
+}
+RENDITION_IDLE_SECONDS = 3  # sin latido de un visor → se deja de codificar
+
+# Clips de eventos (anillo en memoria de frames recientes por cámara)
+CLIP_DIR = DATA_DIR / "clips"
+CLIP_PRE_SECONDS = 5  # pre-roll guardado antes del evento
+CLIP_POST_SECONDS = 5  # post-roll guardado después del evento
+CLIP_BUFFER_BYTES = 48_000_000  # memoria fija por cámara para el anillo
+CLIP_INDEX_SLOTS = 2048  # máximo de frames indexados en el anillo
+CLIP_QUEUE_SIZE = 32  # clips pendientes de escribir antes de descartar
+CLIP_RETENTION_DAYS = 14  # los clips de días anteriores se borran
+CLIP_MAX_BYTES = 5_000_000_000  # espacio máximo en disco por cámara (se borran los más viejos)
+CLIP_PRUNE_INTERVAL = 600  # cada cuánto se aplica la retención (segundos)
+
+# Mapa de calor y tráfico por hora (agregados precalculados)
+HEATMAP_GRID_ROWS = 48  # resolución reducida de la grilla de ocupación
+HEATMAP_GRID_COLS = 64
+HEATMAP_FLUSH_SECONDS = 60  # cada cuánto se persiste la hora en curso
+
+# Checkpoints de contadores en vivo (recuperación tras reinicio)
+CHECKPOINT_INTERVAL_SECONDS = 10
+
+# Consulta y exportación de eventos
+EVENTS_PAGE_LIMIT = 100      # tamaño de página por defecto en /events
+EVENTS_PAGE_MAX = 1000       # tamaño de página máximo permitido
+EXPORT_CHUNK_SIZE = 5000     # filas leídas por bloque desde el cursor de exportación
+
 # Configuración de notificaciones (placeholder)
 SMTP_SERVER = "smtp.example.com"
 SMTP_PORT = 587
@@ -1,18 +1,22 @@
-from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse, StreamingResponse, JSONResponse, FileResponse
+from fastapi import FastAPI, Request, Query
+from fastapi.responses import HTMLResponse, StreamingResponse, JSONResponse, FileResponse, Response
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
+import asyncio
 import os
-import cv2
 import logging
 from logging.handlers import TimedRotatingFileHandler
-from ultralytics import YOLO
-from modules import storage, alerts, notifications
+from modules import storage, alerts, export, control, heatmap
+from modules.shared_state import FrameRing, SharedCounters
+from config import (
+    EVENTS_PAGE_LIMIT, EVENTS_PAGE_MAX, DEFAULT_CAMERA_ID,
+    EMBEDDED_WORKER, WORKER_HEARTBEAT_TIMEOUT, RENDITIONS, RENDITION_IDLE_SECONDS,
+)
 from reports.daily_report import generate_daily_report
 from reports.weekly_report import generate_weekly_report
 from reports.monthly_report import generate_monthly_report
+from utils.plots import render_heatmap_png
 import time
-import numpy as np
 
 # -----------------------------
 # 📜 Configuración de logs
@@ -34,14 +38,18 @@ logger.addHandler(handler)
 # -----------------------------
 # 🚀 FastAPI App
 # -----------------------------
+# La API no guarda estado: cámaras, modelo, trackers y contadores viven en el
+# worker (worker.py). Aquí sólo se leen desde memoria compartida y los
+# comandos se envían por IPC, así que se pueden correr varios workers de uvicorn.
 app = FastAPI()
 storage.init_db()
 logger.info("🚀 Aplicación iniciada y base de datos inicializada")
 
-# Estado global
-STATE = {"inside": 0, "entered": 0, "exited": 0}
-CAMERA_ACTIVE = False  # control desde UI
-CAMERA_STATUS = "OFFLINE"  # "ONLINE", "OFFLINE", "RECONNECTING"
+OFFLINE_STATUS = {
+    "state": {"inside": 0, "entered": 0, "exited": 0},
+    "camera_active": False,
+    "camera_status": "OFFLINE",
+}
 
 # 🔤 Traducciones de estado de cámara
 STATUS_TRANSLATIONS = {
@@ -64,19 +72,77 @@ async def favicon():
     return JSONResponse(status_code=404, content={"error": "favicon not found"})
 
 # -----------------------------
-# 🔍 Cargar modelo YOLOv8
+# 🔌 Conexión con el worker de visión
 # -----------------------------
-try:
-    model = YOLO("yolov8n.pt")
-    logger.info("✅ Modelo YOLO cargado exitosamente")
-except Exception as e:
-    logger.error(f"❌ Error cargando modelo YOLO: {e}", exc_info=True)
-    raise
-
-# Historial de posiciones y eventos
-last_positions = {}
-last_events = {}  # {person_id: {"action": "entered"/"exited", "time": timestamp}}
-EVENT_DEBOUNCE_SECONDS = 3  # Tiempo mínimo entre eventos repetidos
+_views = {}  # camera_id -> {"counters": SharedCounters, "rings": {rendition: FrameRing}}
+_last_worker_check = 0.0
+
+def ensure_worker():
+    """
+    Con EMBEDDED_WORKER, lanza el worker si no está corriendo. Se revisa al
+    arrancar y cada vez que un latido vence, así cualquier proceso de la API
+    lo relanza si murió. Si varios lo lanzan a la vez, sólo uno toma el
+    canal de control; los demás terminan de inmediato.
+    """
+    global _last_worker_check
+    if not EMBEDDED_WORKER or time.time() - _last_worker_check < WORKER_HEARTBEAT_TIMEOUT:
+        return
+    _last_worker_check = time.time()
+    if not control.is_worker_running():
+        control.spawn_worker()
+        logger.info("🚀 Worker de visión lanzado desde la API")
+
+@app.on_event("startup")
+async def start_worker():
+    ensure_worker()
+
+def camera_view(camera_id: str):
+    """
+    Devuelve los contadores y los anillos de frames de la cámara,
+    conectándose a la memoria compartida del worker la primera vez o si el
+    worker se reinició. Retorna None si el worker no está publicando esa cámara.
+    """
+    view = _views.get(camera_id)
+    if view is not None:
+        if time.time() - view["counters"].read()["heartbeat"] <= WORKER_HEARTBEAT_TIMEOUT:
+            return view
+        # Latido vencido: el worker murió o creó segmentos nuevos. No se cierran
+        # aquí porque otro stream puede estar leyéndolos; se liberan al soltarlos.
+        _views.pop(camera_id)
+        ensure_worker()
+    try:
+        view = {"counters": SharedCounters.attach(camera_id), "rings": {}}
+    except FileNotFoundError:
+        ensure_worker()
+        return None
+    _views[camera_id] = view
+    return view
+
+def frame_ring(camera_id: str, rendition: str = "full"):
+    """Anillo de frames de una rendition de la cámara, o None si no existe"""
+    view = camera_view(camera_id)
+    if view is None:
+        return None
+    ring = view["rings"].get(rendition)
+    if ring is None:
+        try:
+            ring = FrameRing.attach(camera_id, rendition)
+        except FileNotFoundError:
+            return None
+        view["rings"][rendition] = ring
+    return ring
+
+def camera_status(camera_id: str) -> dict:
+    view = camera_view(camera_id)
+    if view is None:
+        return OFFLINE_STATUS
+    status = view["counters"].read()
+    if time.time() - status["heartbeat"] > WORKER_HEARTBEAT_TIMEOUT:
+        return OFFLINE_STATUS
+    return status
+
+def translate_status(status: str) -> str:
+    return STATUS_TRANSLATIONS.get(status.split()[0], status)
 
 # -----------------------------
 # 📄 Páginas principales
@@ -84,26 +150,25 @@ EVENT_DEBOUNCE_SECONDS = 3  # Tiempo mínimo entre eventos repetidos
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
     logger.info("📄 Página principal servida")
+    status = camera_status(DEFAULT_CAMERA_ID)
     return templates.TemplateResponse(
         "index.html",
         {
             "request": request,
-            "state": STATE,
-            "camera_active": CAMERA_ACTIVE,
-            "camera_status": STATUS_TRANSLATIONS.get(CAMERA_STATUS.split()[0], CAMERA_STATUS),
+            "state": status["state"],
+            "camera_active": status["camera_active"],
+            "camera_status": translate_status(status["camera_status"]),
         },
     )
 
 @app.get("/status")
-async def get_status():
-    logger.debug(f"📊 Estado solicitado: {STATE} - CAMERA_STATUS: {CAMERA_STATUS}")
-    camera_status_display = STATUS_TRANSLATIONS.get(
-        CAMERA_STATUS.split()[0], CAMERA_STATUS
-    )
+async def get_status(camera: str = DEFAULT_CAMERA_ID):
+    status = camera_status(camera)
+    logger.debug(f"📊 Estado solicitado: {status['state']} - CAMERA_STATUS: {status['camera_status']}")
     return {
-        "state": STATE,
-        "camera_active": CAMERA_ACTIVE,
-        "camera_status": camera_status_display
+        "state": status["state"],
+        "camera_active": status["camera_active"],
+        "camera_status": translate_status(status["camera_status"]),
     }
 
 @app.get("/durations")
@@ -111,6 +176,110 @@ async def get_durations():
     logger.info("⏱️ Consulta de tiempos de permanencia")
     return storage.get_person_durations()
 
+# -----------------------------
+# 🗂️ Consulta y exportación de eventos
+# -----------------------------
+@app.get("/events")
+async def list_events(
+    start: str | None = None,
+    end: str | None = None,
+    action: str | None = None,
+    person_id: int | None = None,
+    camera: str | None = None,
+    cursor: str | None = None,
+    limit: int = Query(EVENTS_PAGE_LIMIT, ge=1, le=EVENTS_PAGE_MAX),
+):
+    try:
+        start, end = export.parse_range(start, end)
+        after = export.decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+    rows, last = storage.query_events(
+        start=start, end=end, action=action, person_id=person_id,
+        camera_id=camera, after=after, limit=limit,
+    )
+    logger.info(f"🗂️ Consulta de eventos: {len(rows)} filas")
+    return {
+        "events": rows,
+        "next_cursor": export.encode_cursor(last) if last else None,
+    }
+
+@app.get("/events/export")
+def export_events(
+    request: Request,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    start: str | None = None,
+    end: str | None = None,
+    action: str | None = None,
+    person_id: int | None = None,
+    camera: str | None = None,
+):
+    try:
+        start, end = export.parse_range(start, end)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+    compress = export.accepts_gzip(request.headers.get("accept-encoding", ""))
+    headers = {
+        "Content-Disposition": f'attachment; filename="events.{format}"',
+        "Vary": "Accept-Encoding",
+    }
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+
+    logger.info(f"🗂️ Exportación de eventos en {format} (gzip={compress})")
+    return StreamingResponse(
+        export.stream_events(
+            format, compress, start=start, end=end, action=action,
+            person_id=person_id, camera_id=camera,
+        ),
+        media_type=export.EXPORT_MEDIA_TYPES[format],
+        headers=headers,
+    )
+
+@app.get("/events/{event_id}/clip")
+async def event_clip(event_id: int):
+    clip_path = storage.get_event_clip(event_id)
+    if not clip_path or not os.path.exists(clip_path):
+        return JSONResponse(status_code=404, content={"error": "El evento no tiene clip"})
+    return FileResponse(clip_path, media_type="video/x-motion-jpeg", filename=os.path.basename(clip_path))
+
+# -----------------------------
+# 🔥 Analítica (mapa de calor y tráfico por hora)
+# -----------------------------
+# Se calculan desde los agregados del worker (por hora y por día), nunca
+# desde eventos crudos: un mes suma ~30 grillas pequeñas, no millones de filas.
+@app.get("/analytics/heatmap.png")
+async def heatmap_image(start: str | None = None, end: str | None = None, camera: str | None = None):
+    try:
+        start, end = export.parse_range(start, end)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    grid, count = heatmap.load_heatmap(camera, start, end)
+    if grid is None:
+        return JSONResponse(status_code=404, content={"error": "Sin datos de ocupación en el rango"})
+    logger.info(f"🔥 Mapa de calor generado ({count} grillas agregadas)")
+    return Response(render_heatmap_png(grid), media_type="image/png")
+
+@app.get("/analytics/hourly")
+async def hourly_traffic(start: str | None = None, end: str | None = None, camera: str | None = None):
+    try:
+        start, end = export.parse_range(start, end)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    return heatmap.load_hourly_traffic(camera, start, end)
+
+# -----------------------------
+# 📈 Métricas del worker
+# -----------------------------
+@app.get("/metrics")
+def metrics():
+    try:
+        return control.send_command("stats")
+    except (ConnectionError, OSError):
+        return JSONResponse(status_code=503, content={"error": "Worker de visión no disponible"})
+
 # -----------------------------
 # 📑 Reportes (PDF)
 # -----------------------------
@@ -133,162 +302,87 @@ async def monthly_report():
     return FileResponse(filepath, media_type="application/pdf", filename="monthly_report.pdf")
 
 # -----------------------------
-# 🔧 Utilidades para reconexión
-# -----------------------------
-def make_offline_frame(width=640, height=480, text="CÁMARA FUERA DE LÍNEA"):
-    frame = np.zeros((height, width, 3), dtype=np.uint8)
-    font = cv2.FONT_HERSHEY_SIMPLEX
-    scale, thickness = 1.0, 2
-    text_size = cv2.getTextSize(text, font, scale, thickness)[0]
-    x, y = (width - text_size[0]) // 2, (height + text_size[1]) // 2
-    cv2.putText(frame, text, (x, y), font, scale, (0, 0, 255), thickness, cv2.LINE_AA)
-    _, buf = cv2.imencode(".jpg", frame)
-    return buf.tobytes()
-
-def notify_camera_status(status, details=None):
-    try:
-        if hasattr(notifications, "notify"):
-            notifications.notify({"camera_status": status, "details": details})
-        elif hasattr(notifications, "send"):
-            notifications.send({"camera_status": status, "details": details})
-    except Exception:
-        logger.debug("No se pudo enviar notificación de cámara.")
-
-# -----------------------------
-# 📷 Video con YOLOv8 + Tracking + Reconexión + Debounce
+# 📷 Video desde el anillo de frames del worker
 # -----------------------------
-def generate_video():
-    global CAMERA_ACTIVE, CAMERA_STATUS, last_positions, last_events
-
-    BASE_BACKOFF, MAX_BACKOFF, MAX_ATTEMPTS = 1.0, 16.0, None
-    offline_frame = make_offline_frame()
-
-    while CAMERA_ACTIVE:
-        cap = cv2.VideoCapture(0)
-        if not cap.isOpened():
-            CAMERA_STATUS = "OFFLINE"
-            logger.warning("⚠️ No se pudo abrir la cámara: entrando en reconexión")
-            notify_camera_status("OFFLINE", "No se pudo abrir cámara")
-            attempt, backoff = 0, BASE_BACKOFF
-
-            while CAMERA_ACTIVE and (MAX_ATTEMPTS is None or attempt < MAX_ATTEMPTS):
-                attempt += 1
-                CAMERA_STATUS = f"RECONNECTING (attempt {attempt})"
-                logger.info(f"🔄 Intento reconexión #{attempt} en {backoff:.1f}s")
-                notify_camera_status("RECONNECTING", {"attempt": attempt})
-
-                start_wait = time.time()
-                while time.time() - start_wait < backoff and CAMERA_ACTIVE:
-                    yield b"--frame\r\nContent-Type: image/jpeg\r\n\r\n" + offline_frame + b"\r\n"
-                    time.sleep(1.0)
-
-                cap = cv2.VideoCapture(0)
-                if cap.isOpened():
-                    CAMERA_STATUS = "ONLINE"
-                    logger.info("✅ Cámara reconectada")
-                    notify_camera_status("ONLINE")
-                    break
-                backoff = min(backoff * 2.0, MAX_BACKOFF)
-
-            if not cap or not cap.isOpened():
-                CAMERA_STATUS = "OFFLINE"
-                logger.error("❌ No fue posible reconectar la cámara")
-                notify_camera_status("OFFLINE", "Reconexión fallida")
-                while CAMERA_ACTIVE:
-                    yield b"--frame\r\nContent-Type: image/jpeg\r\n\r\n" + offline_frame + b"\r\n"
-                    time.sleep(1.0)
-                break
-
-        line_y = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT) // 2) or 240
-        CAMERA_STATUS = "ONLINE"
-        logger.info("📷 Cámara iniciada para streaming")
-        notify_camera_status("ONLINE")
-
-        while CAMERA_ACTIVE:
-            success, frame = cap.read()
-            if not success:
-                logger.warning("⚠️ Fallo al leer frame. Intentando reconectar...")
-                cap.release()
-                CAMERA_STATUS = "OFFLINE"
-                notify_camera_status("OFFLINE", "Fallo lectura frame")
-                break
-
-            try:
-                results = model.track(frame, persist=True, stream=True)
-            except Exception as e:
-                logger.error(f"❌ Error YOLO: {e}", exc_info=True)
-                _, buffer = cv2.imencode(".jpg", frame)
-                yield b"--frame\r\nContent-Type: image/jpeg\r\n\r\n" + buffer.tobytes() + b"\r\n"
-                continue
-
-            for r in results:
-                if not hasattr(r, "boxes") or r.boxes is None:
-                    continue
-                for box in r.boxes:
-                    if not hasattr(box, "id") or box.id is None:
-                        continue
-                    cls = int(box.cls[0])
-                    if model.names[cls] != "person":
-                        continue
-
-                    person_id = int(box.id[0])
-                    _, y1, _, y2 = map(int, box.xyxy[0])
-                    cy = (y1 + y2) // 2
-
-                    if person_id in last_positions:
-                        prev_y = last_positions[person_id]
-                        action = "entered" if prev_y > line_y and cy <= line_y else \
-                                 "exited" if prev_y < line_y and cy >= line_y else None
-
-                        if action:
-                            now = time.time()
-                            last_event = last_events.get(person_id)
-                            if not last_event or last_event["action"] != action or (now - last_event["time"]) > EVENT_DEBOUNCE_SECONDS:
-                                if action == "entered":
-                                    STATE["entered"] += 1
-                                    STATE["inside"] += 1
-                                else:
-                                    STATE["exited"] += 1
-                                    STATE["inside"] = max(0, STATE["inside"] - 1)
-
-                                storage.save_event(action, person_id)
-                                logger.info(f"👤 Persona {person_id} { 'entró' if action == 'entered' else 'salió' }")
-                                last_events[person_id] = {"action": action, "time": now}
-
-                    last_positions[person_id] = cy
-
-            cv2.line(frame, (0, line_y), (frame.shape[1], line_y), (255, 0, 0), 2)
-            _, buffer = cv2.imencode(".jpg", frame)
-            yield b"--frame\r\nContent-Type: image/jpeg\r\n\r\n" + buffer.tobytes() + b"\r\n"
-
-        cap.release()
-
-    CAMERA_STATUS = "OFFLINE"
-    logger.info("📷 Cámara detenida")
-    notify_camera_status("OFFLINE", "Stream terminado")
+VIDEO_POLL_INTERVAL = 0.01  # espera entre lecturas del anillo sin frame nuevo ("full")
+
+def _frame_interval(rendition: str) -> float:
+    """Tiempo mínimo entre frames de la rendition según su FPS máximo (0 = sin tope)"""
+    max_fps = RENDITIONS[rendition]["max_fps"]
+    return 1.0 / max_fps if max_fps else 0.0
+
+async def generate_video(camera_id: str, rendition: str = "full"):
+    """
+    Stream MJPEG desde el anillo del worker. Es asíncrono: las esperas son
+    await asyncio.sleep, así que un visor no ocupa un hilo del threadpool
+    (que comparten /snapshot.jpg, /toggle_camera, /metrics y /events/export).
+    Con un FPS máximo, tras cada frame espera hasta el siguiente y entre
+    lecturas sin frame nuevo consulta a una fracción de ese intervalo.
+    """
+    seq, last_touch = 0, 0.0
+    interval = _frame_interval(rendition)
+    poll = max(VIDEO_POLL_INTERVAL, interval / 4)
+    while True:
+        ring = frame_ring(camera_id, rendition)
+        if ring is None or not camera_status(camera_id)["camera_active"]:
+            break
+        # Latido del visor: el worker sólo codifica renditions con suscriptores
+        if time.time() - last_touch >= RENDITION_IDLE_SECONDS / 4:
+            ring.touch()
+            last_touch = time.time()
+        seq, frame = ring.read(seq)
+        if frame is None:
+            await asyncio.sleep(poll)
+            continue
+        yield b"--frame\r\nContent-Type: image/jpeg\r\n\r\n" + frame + b"\r\n"
+        if interval:
+            await asyncio.sleep(interval)
 
 @app.get("/video")
-async def video_feed():
-    if not CAMERA_ACTIVE:
+async def video_feed(camera: str = DEFAULT_CAMERA_ID, rendition: str = "full"):
+    if rendition not in RENDITIONS:
+        return JSONResponse(status_code=404, content={"error": f"Rendition desconocida: {rendition}"})
+    if not camera_status(camera)["camera_active"]:
         logger.warning("⚠️ Solicitud de video pero cámara apagada")
         return JSONResponse({"error": "Cámara apagada"})
     return StreamingResponse(
-        generate_video(), media_type="multipart/x-mixed-replace; boundary=frame"
+        generate_video(camera, rendition), media_type="multipart/x-mixed-replace; boundary=frame"
     )
 
+@app.get("/snapshot.jpg")
+def snapshot(request: Request, camera: str = DEFAULT_CAMERA_ID, rendition: str = "full"):
+    """
+    Último frame anotado ya publicado por el worker (no toca la pipeline).
+    Para miniaturas y grillas tipo NVR: se puede consultar periódicamente
+    con If-None-Match y sólo se transfiere cuando hay un frame nuevo.
+    """
+    if rendition not in RENDITIONS:
+        return JSONResponse(status_code=404, content={"error": f"Rendition desconocida: {rendition}"})
+    ring = frame_ring(camera, rendition)
+    if ring is not None and rendition != "full":
+        ring.touch()  # mantiene viva la rendition para el siguiente snapshot
+        if time.time() - ring.published_at() > RENDITION_IDLE_SECONDS:
+            # Todavía no se está codificando: se responde con la versión completa
+            rendition, ring = "full", frame_ring(camera, "full")
+    seq, frame = ring.read() if ring is not None else (0, None)
+    if frame is None:
+        return JSONResponse(status_code=404, content={"error": "Sin frames disponibles"})
+    etag = f'"{camera}-{rendition}-{seq}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=frame, media_type="image/jpeg", headers=headers)
+
 @app.post("/toggle_camera")
-async def toggle_camera():
-    global CAMERA_ACTIVE, CAMERA_STATUS
-    CAMERA_ACTIVE = not CAMERA_ACTIVE
-    if CAMERA_ACTIVE:
-        CAMERA_STATUS = "ONLINE"
-        logger.info("✅ Cámara encendida")
-        notify_camera_status("ONLINE")
-    else:
-        CAMERA_STATUS = "OFFLINE"
-        logger.info("🛑 Cámara apagada")
-        notify_camera_status("OFFLINE")
+def toggle_camera(camera: str = DEFAULT_CAMERA_ID):
+    try:
+        reply = control.send_command("toggle_camera", camera_id=camera)
+    except (ConnectionError, OSError):
+        logger.error("❌ Worker de visión no disponible")
+        return JSONResponse(status_code=503, content={"error": "Worker de visión no disponible"})
+    if "error" in reply:
+        return JSONResponse(status_code=404, content=reply)
     return {
-        "camera_active": CAMERA_ACTIVE,
-        "camera_status": STATUS_TRANSLATIONS.get(CAMERA_STATUS.split()[0], CAMERA_STATUS)
-    }      
\ No newline at end of file
+        "camera_active": reply["camera_active"],
+        "camera_status": translate_status(reply["camera_status"])
+    }
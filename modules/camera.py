@@ -0,0 +1,248 @@
+import logging
+import random
+import threading
+import time
+import cv2
+import numpy as np
+from config import CAMERA_BASE_BACKOFF, CAMERA_MAX_BACKOFF, CAMERA_STALL_SECONDS, CAMERA_WATCHDOG_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+_OFFLINE_FRAME = None
+
+
+def make_offline_frame(width=640, height=480, text="CÁMARA FUERA DE LÍNEA"):
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    font = cv2.FONT_HERSHEY_SIMPLEX
+    scale, thickness = 1.0, 2
+    text_size = cv2.getTextSize(text, font, scale, thickness)[0]
+    x, y = (width - text_size[0]) // 2, (height + text_size[1]) // 2
+    cv2.putText(frame, text, (x, y), font, scale, (0, 0, 255), thickness, cv2.LINE_AA)
+    _, buf = cv2.imencode(".jpg", frame)
+    return buf.tobytes()
+
+
+def offline_frame() -> bytes:
+    """JPEG de cámara fuera de línea, codificado una sola vez y compartido"""
+    global _OFFLINE_FRAME
+    if _OFFLINE_FRAME is None:
+        _OFFLINE_FRAME = make_offline_frame()
+    return _OFFLINE_FRAME
+
+
+def _signature(frame) -> bytes:
+    """Muestra dispersa del frame: si no cambia, la cámara está congelada"""
+    return frame[::32, ::32].tobytes()
+
+
+class CameraSupervisor:
+    """
+    Dueño de la captura de una cámara, independiente de los clientes HTTP.
+
+    - Abre y reabre la fuente con backoff exponencial con jitter, tanto si
+      falla la apertura como si la conexión falla o se detiene después.
+    - Un hilo lector por conexión deja el último frame disponible en latest().
+    - Un watchdog detecta streams detenidos o congelados (sin frames nuevos o
+      frames idénticos durante stall_seconds) y fuerza la reconexión.
+    - La conexión se da por recuperada (ONLINE) con el primer frame real,
+      no al abrir la fuente.
+    - Expone el estado de salud en status / stats().
+
+    capture_factory(source) debe devolver un objeto con isOpened(), read()
+    y release() (cv2.VideoCapture por defecto; en pruebas, una fuente falsa).
+    on_status(status, attempt, details) se llama en cada cambio de estado.
+    """
+
+    def __init__(self, camera_id: str, source, on_status=None, capture_factory=cv2.VideoCapture,
+                 base_backoff: float = CAMERA_BASE_BACKOFF, max_backoff: float = CAMERA_MAX_BACKOFF,
+                 stall_seconds: float = CAMERA_STALL_SECONDS, watchdog_interval: float = CAMERA_WATCHDOG_INTERVAL):
+        self.camera_id = camera_id
+        self.source = source
+        self.on_status = on_status
+        self.capture_factory = capture_factory
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.stall_seconds = stall_seconds
+        self.watchdog_interval = watchdog_interval
+
+        self.active = False
+        self.status = "OFFLINE"  # "ONLINE", "OFFLINE", "RECONNECTING"
+        self.attempt = 0
+        self.reconnects = 0
+        self.stalls = 0
+        self.frames_read = 0
+
+        self._cond = threading.Condition()
+        self._frame = None
+        self._seq = 0
+        self._last_change = 0.0  # último frame distinto al anterior (0 = ninguno todavía)
+        self._generation = 0  # conexión vigente; los lectores de conexiones viejas terminan solos
+        self._failed_generation = -1
+        self._frame_generation = -1  # conexión que entregó el último frame
+        self._failures = 0  # intentos fallidos seguidos; se reinicia con el primer frame real
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # -----------------------------
+    # 📡 Lectura para la pipeline
+    # -----------------------------
+    def latest(self, after_seq: int = 0, timeout: float = None):
+        """
+        Espera hasta timeout un frame posterior a after_seq.
+        Retorna (seq, frame) o (after_seq, None) si no llegó ninguno.
+        """
+        with self._cond:
+            if self._seq <= after_seq:
+                self._cond.wait(timeout)
+            if self._seq <= after_seq or self._frame is None:
+                return after_seq, None
+            return self._seq, self._frame
+
+    def stats(self) -> dict:
+        return {
+            "status": self.status,
+            "attempt": self.attempt,
+            "reconnects": self.reconnects,
+            "stalls": self.stalls,
+            "frames_read": self.frames_read,
+            "last_frame_age": round(time.monotonic() - self._last_change, 2) if self._last_change else None,
+        }
+
+    # -----------------------------
+    # 🎛️ Control
+    # -----------------------------
+    def set_active(self, active: bool):
+        self.active = active
+        if not active:
+            self._set_status("OFFLINE")
+        # Al encender, ONLINE se reporta recién con el primer frame real
+        self._wake.set()
+
+    def _set_status(self, status, attempt=0, details=None):
+        if (status, attempt) == (self.status, self.attempt):
+            return
+        self.status, self.attempt = status, attempt
+        if self.on_status is not None:
+            self.on_status(status, attempt, details)
+
+    # -----------------------------
+    # 🔁 Conexión, lectura y watchdog
+    # -----------------------------
+    def _backoff(self, attempt: int) -> float:
+        """Backoff exponencial con jitter: evita reconexiones sincronizadas"""
+        delay = min(self.max_backoff, self.base_backoff * 2 ** (attempt - 1))
+        return random.uniform(delay / 2, delay)
+
+    def _sleep(self, seconds: float):
+        """Espera interrumpible por stop() o por un cambio de set_active()"""
+        self._wake.wait(seconds)
+        self._wake.clear()
+
+    def _read_loop(self, cap, generation: int):
+        previous = None
+        try:
+            while generation == self._generation and not self._stop.is_set():
+                success, frame = cap.read()
+                if generation != self._generation:
+                    break
+                if not success:
+                    self._failed_generation = generation
+                    self._wake.set()
+                    break
+                signature = _signature(frame)
+                if signature == previous:
+                    continue  # frame congelado: no cuenta como frame nuevo
+                previous = signature
+                with self._cond:
+                    self._frame = frame
+                    self._seq += 1
+                    self._last_change = time.monotonic()
+                    self.frames_read += 1
+                    first = self._frame_generation != generation
+                    self._frame_generation = generation
+                    self._cond.notify_all()
+                if first:
+                    self._wake.set()  # el watchdog confirma la conexión sin esperar su intervalo
+        finally:
+            # El lector libera su propia captura: liberarla desde otro hilo
+            # mientras read() está bloqueado no es seguro en todos los backends.
+            cap.release()
+
+    def _connected(self):
+        """Primer frame real de la conexión: recién ahí se da por recuperada"""
+        if self._failures:
+            self.reconnects += 1
+            logger.info(f"✅ Cámara {self.camera_id} reconectada")
+        self._failures = 0
+        self._set_status("ONLINE")
+
+    def _fail(self, reason: str):
+        """Cuenta el intento fallido y espera el backoff antes de reabrir"""
+        self._failures += 1
+        delay = self._backoff(self._failures)
+        logger.warning(
+            f"⚠️ Cámara {self.camera_id}: {reason}. "
+            f"Intento reconexión #{self._failures} en {delay:.1f}s"
+        )
+        self._set_status("RECONNECTING", self._failures, {"attempt": self._failures, "reason": reason})
+        # Despertares de lectores no acortan el backoff; stop() y apagar sí
+        deadline = time.monotonic() + delay
+        while self.active and not self._stop.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._sleep(remaining)
+
+    def _watch(self, generation: int, opened_at: float):
+        """Retorna el motivo por el que hay que reconectar, o None si se desactivó"""
+        online = False
+        while self.active and not self._stop.is_set():
+            if not online and self._frame_generation == generation:
+                online = True
+                self._connected()
+            if self._failed_generation == generation:
+                return "Fallo lectura frame"
+            # Sin frames desde el último frame real o desde que se abrió la conexión
+            if time.monotonic() - max(self._last_change, opened_at) > self.stall_seconds:
+                self.stalls += 1
+                return f"Sin frames nuevos por {self.stall_seconds:g}s"
+            self._sleep(self.watchdog_interval)
+        return None
+
+    def _run(self):
+        while not self._stop.is_set():
+            if not self.active:
+                self._failures = 0
+                self._sleep(0.5)
+                continue
+
+            cap = self.capture_factory(self.source)
+            if not cap.isOpened():
+                cap.release()
+                self._fail("No se pudo abrir la fuente")
+                continue
+
+            self._generation += 1
+            generation = self._generation
+            threading.Thread(
+                target=self._read_loop, args=(cap, generation),
+                name=f"capture-{self.camera_id}-{generation}", daemon=True,
+            ).start()
+
+            reason = self._watch(generation, time.monotonic())
+            self._generation += 1  # abandona al lector de esta conexión
+            if reason is not None and self.active:
+                self._fail(reason)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f"supervisor-{self.camera_id}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.active = False
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._generation += 1
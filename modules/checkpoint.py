@@ -0,0 +1,138 @@
+import logging
+import threading
+import time
+from modules import storage
+
+logger = logging.getLogger(__name__)
+
+EVENT_DEBOUNCE_SECONDS = 3  # Tiempo mínimo entre eventos repetidos
+
+
+def restore_counters(camera_id: str):
+    """
+    Reconstruye los contadores en vivo de una cámara tras un reinicio:
+    último checkpoint + sólo los eventos escritos después de él.
+    Retorna (contadores, id del último evento contabilizado, estado del tracker).
+    """
+    t0 = time.perf_counter()
+    checkpoint = storage.load_checkpoint(camera_id)
+
+    if checkpoint is None:
+        # Primera ejecución: no hay nada que reproducir, sólo quienes siguen adentro
+        last_event_id, inside = storage.get_bootstrap_state(camera_id)
+        counters = {"inside": inside, "entered": 0, "exited": 0}
+        tracker_state = {}
+        replayed = 0
+    else:
+        counters = checkpoint["counters"]
+        tracker_state = checkpoint["tracker_state"]
+        counts, last_event_id = storage.get_events_since(camera_id, checkpoint["last_event_id"])
+        entered, exited = counts.get("entered", 0), counts.get("exited", 0)
+        counters["entered"] += entered
+        counters["exited"] += exited
+        counters["inside"] = max(0, counters["inside"] + entered - exited)
+        replayed = entered + exited
+
+    elapsed_ms = (time.perf_counter() - t0) * 1000
+    logger.info(
+        f"♻️ Contadores de {camera_id} restaurados en {elapsed_ms:.1f} ms "
+        f"({replayed} eventos posteriores al checkpoint): {counters}"
+    )
+    return counters, last_event_id, tracker_state
+
+
+class LiveCounters:
+    """
+    Contadores en vivo de una cámara con su debounce por persona.
+    Se restauran desde el último checkpoint al crearse, y snapshot() entrega
+    la copia consistente que guarda el Checkpointer.
+    """
+
+    def __init__(self, camera_id: str, debounce_seconds: float = EVENT_DEBOUNCE_SECONDS):
+        self.camera_id = camera_id
+        self.debounce_seconds = debounce_seconds
+        self.lock = threading.Lock()  # state y last_event_id se actualizan juntos
+        self.state, self.last_event_id, tracker_state = restore_counters(camera_id)
+        # {person_id: {"action": "entered"/"exited", "time": timestamp}}
+        self.last_events = {int(pid): event for pid, event in tracker_state.get("last_events", {}).items()}
+
+    def read(self) -> dict:
+        with self.lock:
+            return dict(self.state)
+
+    def record(self, person_id: int, action: str, now: float = None):
+        """
+        Guarda un cruce en la BD y, si la BD lo acepta, lo cuenta.
+        Los contadores siguen la misma regla que la recuperación
+        (get_events_since sólo reproduce filas guardadas), así que lo que se
+        restaura tras un reinicio coincide con lo que se contaba en vivo.
+        Retorna (id del evento, personas adentro), o None si el cruce se
+        ignoró por debounce o la BD lo descartó como duplicado.
+        """
+        now = time.time() if now is None else now
+        last_event = self.last_events.get(person_id)
+        if last_event and last_event["action"] == action and (now - last_event["time"]) <= self.debounce_seconds:
+            return None
+
+        with self.lock:
+            self.last_events[person_id] = {"action": action, "time": now}
+            event_id = storage.save_event(action, person_id, self.camera_id)
+            if event_id is None:
+                return None
+            if action == "entered":
+                self.state["entered"] += 1
+                self.state["inside"] += 1
+            else:
+                self.state["exited"] += 1
+                self.state["inside"] = max(0, self.state["inside"] - 1)
+            self.last_event_id = event_id
+            return event_id, self.state["inside"]
+
+    def snapshot(self):
+        """Copia consistente de contadores y estado del tracker para el checkpoint"""
+        with self.lock:
+            now = time.time()
+            # Los IDs del tracker se reinician con el modelo, así que las posiciones
+            # no sobreviven a un reinicio; sólo se conserva la ventana de debounce.
+            recent_events = {
+                pid: event for pid, event in self.last_events.items()
+                if now - event["time"] <= self.debounce_seconds
+            }
+            return dict(self.state), self.last_event_id, {"last_events": recent_events}
+
+
+class Checkpointer:
+    """
+    Guarda periódicamente en la BD el estado en vivo de una cámara.
+    snapshot: función que retorna (contadores, last_event_id, tracker_state)
+    de forma consistente (tomados bajo el mismo lock que los actualiza).
+    """
+
+    def __init__(self, camera_id: str, snapshot, interval: float):
+        self.camera_id = camera_id
+        self.snapshot = snapshot
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def checkpoint_now(self):
+        counters, last_event_id, tracker_state = self.snapshot()
+        storage.save_checkpoint(self.camera_id, counters, last_event_id, tracker_state)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.checkpoint_now()
+            except Exception as e:
+                logger.error(f"❌ Error guardando checkpoint de {self.camera_id}: {e}", exc_info=True)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f"checkpoint-{self.camera_id}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Detiene el hilo y guarda un último checkpoint"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.checkpoint_now()
@@ -0,0 +1,245 @@
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from modules import storage
+
+logger = logging.getLogger(__name__)
+
+
+class ClipBuffer:
+    """
+    Anillo de frames JPEG recientes de una cámara sobre memoria preasignada:
+    un bytearray de capacidad fija para los bytes y arreglos NumPy para el
+    índice (posición, longitud, instante). La memoria no crece nunca.
+
+    Un solo escritor (el hilo de captura) y lectores en otros hilos. Las
+    posiciones son absolutas y crecientes: un lector copia sin lock y luego
+    verifica que el escritor no haya reservado ya esa zona del anillo.
+    """
+
+    def __init__(self, capacity_bytes: int, index_slots: int):
+        self.capacity = capacity_bytes
+        self.data = bytearray(capacity_bytes)
+        self.view = memoryview(self.data)
+        self.positions = np.zeros(index_slots, dtype=np.int64)
+        self.lengths = np.zeros(index_slots, dtype=np.int64)
+        self.times = np.zeros(index_slots, dtype=np.float64)
+        self.index_slots = index_slots
+        self.count = 0  # frames escritos desde el inicio
+        self.head = 0  # posición absoluta del final del último frame escrito
+        self.reserved = 0  # posición absoluta hasta donde el escritor puede estar escribiendo
+        self.lock = threading.Lock()  # protege sólo el índice
+
+    def append(self, jpeg: bytes, timestamp: float = None):
+        """Copia el frame al anillo. O(tamaño del frame), sin asignaciones"""
+        length = len(jpeg)
+        if length > self.capacity:
+            return
+        start = self.head
+        if start % self.capacity + length > self.capacity:
+            # No se parte un frame en dos: salta al inicio del anillo
+            start += self.capacity - start % self.capacity
+        self.reserved = start + length
+        offset = start % self.capacity
+        self.view[offset:offset + length] = jpeg
+
+        with self.lock:
+            slot = self.count % self.index_slots
+            self.positions[slot] = start
+            self.lengths[slot] = length
+            self.times[slot] = time.time() if timestamp is None else timestamp
+            self.count += 1
+            self.head = start + length
+
+    def frames_between(self, start_time: float, end_time: float):
+        """
+        Retorna [(instante, bytes)] de los frames en [start_time, end_time]
+        que siguen intactos en el anillo, en orden cronológico.
+        """
+        with self.lock:
+            n = min(self.count, self.index_slots)
+            slots = (np.arange(self.count - n, self.count) % self.index_slots)
+            positions = self.positions[slots]
+            lengths = self.lengths[slots]
+            times = self.times[slots]
+
+        selected = (times >= start_time) & (times <= end_time)
+        frames = []
+        for position, length, timestamp in zip(positions[selected], lengths[selected], times[selected]):
+            offset = int(position) % self.capacity
+            frame = bytes(self.view[offset:offset + int(length)])
+            # Válido si el escritor no alcanzó esta zona mientras se copiaba
+            if self.reserved - position <= self.capacity:
+                frames.append((float(timestamp), frame))
+        return frames
+
+    def stats(self) -> dict:
+        with self.lock:
+            n = min(self.count, self.index_slots)
+            slots = (np.arange(self.count - n, self.count) % self.index_slots)
+            intact = self.head - self.positions[slots] <= self.capacity
+            times = self.times[slots][intact]
+        return {
+            "capacity_bytes": self.capacity,
+            "index_slots": self.index_slots,
+            "frames_written": self.count,
+            "buffered_frames": int(times.size),
+            "buffered_seconds": round(float(times[-1] - times[0]), 2) if times.size else 0.0,
+        }
+
+
+class ClipWriter:
+    """
+    Escribe clips de eventos (pre-roll + post-roll) en un hilo propio.
+    request() nunca bloquea al hilo de captura: si la cola está llena,
+    la solicitud se descarta y se contabiliza.
+
+    Retención: cada prune_interval borra los clips de la cámara con más de
+    retention_days días y, si ocupan más de max_bytes, los más viejos
+    (None = sin límite).
+    """
+
+    def __init__(self, camera_id: str, buffer: ClipBuffer, clip_dir,
+                 pre_seconds: float, post_seconds: float, queue_size: int,
+                 retention_days: float = None, max_bytes: int = None, prune_interval: float = 600):
+        self.camera_id = camera_id
+        self.buffer = buffer
+        self.clip_dir = clip_dir
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.retention_days = retention_days
+        self.max_bytes = max_bytes
+        self.prune_interval = prune_interval
+        self.requests = queue.Queue(maxsize=queue_size)
+        self.clips_written = 0
+        self.clips_pruned = 0
+        self.dropped_requests = 0
+        self.last_write_ms = 0.0
+        self._last_prune = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def request(self, event_id: int, event_time: float = None):
+        try:
+            self.requests.put_nowait((event_id, time.time() if event_time is None else event_time))
+        except queue.Full:
+            self.dropped_requests += 1
+            logger.warning(f"⚠️ Cola de clips de {self.camera_id} llena: evento {event_id} sin clip")
+
+    def _write(self, event_id: int, event_time: float):
+        t0 = time.perf_counter()
+        frames = self.buffer.frames_between(event_time - self.pre_seconds, event_time + self.post_seconds)
+        if not frames:
+            logger.warning(f"⚠️ Sin frames en memoria para el clip del evento {event_id}")
+            return
+
+        day = datetime.fromtimestamp(event_time).date().isoformat()
+        folder = os.path.join(self.clip_dir, self.camera_id, day)
+        os.makedirs(folder, exist_ok=True)
+        filepath = os.path.join(folder, f"event_{event_id}.mjpeg")
+        # MJPEG: JPEGs concatenados, reproducible con VLC/ffplay sin recodificar
+        with open(filepath, "wb") as f:
+            for _, frame in frames:
+                f.write(frame)
+        storage.set_event_clip(event_id, filepath)
+
+        self.clips_written += 1
+        self.last_write_ms = (time.perf_counter() - t0) * 1000
+        logger.info(
+            f"💾 Clip del evento {event_id} guardado: {len(frames)} frames, "
+            f"{os.path.getsize(filepath)} bytes, {self.last_write_ms:.1f} ms"
+        )
+
+    def prune(self, now: float = None) -> int:
+        """Aplica la retención a los clips de la cámara. Retorna cuántos borró"""
+        camera_dir = os.path.join(self.clip_dir, self.camera_id)
+        if not os.path.isdir(camera_dir):
+            return 0
+        now = time.time() if now is None else now
+        cutoff_day = None
+        if self.retention_days is not None:
+            cutoff_day = (datetime.fromtimestamp(now) - timedelta(days=self.retention_days)).date().isoformat()
+
+        clips = []  # (día, mtime, bytes, ruta)
+        for day in os.listdir(camera_dir):
+            folder = os.path.join(camera_dir, day)
+            if not os.path.isdir(folder):
+                continue
+            for entry in os.scandir(folder):
+                stat = entry.stat()
+                clips.append((day, stat.st_mtime, stat.st_size, entry.path))
+        clips.sort()
+        total = sum(clip[2] for clip in clips)
+
+        removed = []
+        for day, _, size, path in clips:
+            too_old = cutoff_day is not None and day < cutoff_day
+            too_big = self.max_bytes is not None and total > self.max_bytes
+            if not (too_old or too_big):
+                break
+            os.remove(path)
+            total -= size
+            removed.append(path)
+
+        for day in os.listdir(camera_dir):
+            folder = os.path.join(camera_dir, day)
+            if os.path.isdir(folder) and not os.listdir(folder):
+                os.rmdir(folder)
+        event_ids = [
+            int(os.path.basename(path)[len("event_"):-len(".mjpeg")]) for path in removed
+            if os.path.basename(path).startswith("event_") and path.endswith(".mjpeg")
+        ]
+        storage.clear_event_clips(event_ids)
+
+        self.clips_pruned += len(removed)
+        if removed:
+            logger.info(f"🧹 Retención de clips de {self.camera_id}: {len(removed)} borrados, {total} bytes en disco")
+        return len(removed)
+
+    def _maybe_prune(self):
+        if time.time() - self._last_prune < self.prune_interval:
+            return
+        self._last_prune = time.time()
+        try:
+            self.prune()
+        except Exception as e:
+            logger.error(f"❌ Error aplicando la retención de clips de {self.camera_id}: {e}", exc_info=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._maybe_prune()
+            try:
+                event_id, event_time = self.requests.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            # Espera a que termine el post-roll
+            remaining = event_time + self.post_seconds - time.time()
+            if remaining > 0 and self._stop.wait(remaining):
+                break
+            try:
+                self._write(event_id, event_time)
+            except Exception as e:
+                logger.error(f"❌ Error escribiendo clip del evento {event_id}: {e}", exc_info=True)
+
+    def stats(self) -> dict:
+        return {
+            **self.buffer.stats(),
+            "clips_written": self.clips_written,
+            "clips_pruned": self.clips_pruned,
+            "dropped_requests": self.dropped_requests,
+            "pending_requests": self.requests.qsize(),
+            "last_write_ms": round(self.last_write_ms, 1),
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f"clips-{self.camera_id}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
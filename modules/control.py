@@ -0,0 +1,126 @@
+import logging
+import os
+import secrets
+import stat
+import subprocess
+import sys
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+from config import BASE_DIR, WORKER_CONTROL_ADDRESS, WORKER_AUTHKEY_ENV, WORKER_AUTHKEY_FILE
+
+logger = logging.getLogger(__name__)
+
+_authkey = None
+
+
+def _read_key_file(path) -> bytes:
+    if os.name == "posix":
+        mode = os.stat(path).st_mode
+        if mode & (stat.S_IRWXG | stat.S_IRWXO):
+            raise PermissionError(f"{path} debe ser privado (chmod 600)")
+    # Otro proceso puede estar escribiéndolo justo ahora
+    for _ in range(50):
+        with open(path, "rb") as f:
+            key = f.read().strip()
+        if key:
+            return key
+        time.sleep(0.01)
+    raise PermissionError(f"{path} está vacío")
+
+
+def load_authkey(path=WORKER_AUTHKEY_FILE) -> bytes:
+    """
+    Clave compartida por la API y el worker para autenticar el canal IPC.
+    multiprocessing.connection deserializa con pickle, así que sólo quien
+    conoce la clave puede enviar comandos (o hacerse pasar por el worker).
+    Prioridad: variable de entorno; si no, el archivo privado, que se crea
+    con permisos 0600 y una clave aleatoria la primera vez.
+    """
+    global _authkey
+    if _authkey is not None:
+        return _authkey
+    env_key = os.environ.get(WORKER_AUTHKEY_ENV)
+    if env_key:
+        _authkey = env_key.encode("utf-8")
+        return _authkey
+
+    path = str(path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        _authkey = _read_key_file(path)
+    else:
+        key = secrets.token_hex(32).encode("ascii")
+        with os.fdopen(fd, "wb") as f:
+            f.write(key)
+        logger.info(f"🔑 Clave del canal de control generada en {path}")
+        _authkey = key
+    return _authkey
+
+
+def send_command(cmd: str, **kwargs) -> dict:
+    """
+    Envía un comando al worker por el canal IPC local y espera la respuesta.
+    Lanza ConnectionError si el worker no está corriendo o si quien
+    atiende el puerto no conoce la clave (no es nuestro worker).
+    """
+    try:
+        with Client(WORKER_CONTROL_ADDRESS, authkey=load_authkey()) as conn:
+            conn.send({"cmd": cmd, **kwargs})
+            return conn.recv()
+    except AuthenticationError as e:
+        raise ConnectionError(f"Canal de control no autenticado: {e}") from e
+
+
+def is_worker_running() -> bool:
+    try:
+        return send_command("ping").get("ok", False)
+    except (ConnectionError, OSError):
+        return False
+
+
+def spawn_worker():
+    """
+    Lanza worker.py como proceso independiente (sesión propia, no hijo
+    daemon): sobrevive a que el proceso de la API que lo lanzó termine o
+    sea reciclado. Si ya hay un worker, el nuevo no toma el canal de
+    control y termina de inmediato.
+    """
+    options = {}
+    if os.name == "posix":
+        options["start_new_session"] = True
+    else:
+        options["creationflags"] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    return subprocess.Popen(
+        [sys.executable, str(BASE_DIR / "worker.py")],
+        cwd=str(BASE_DIR), stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL, close_fds=True, **options,
+    )
+
+
+def open_listener():
+    """
+    Abre el canal de comandos del worker. Falla con OSError si el puerto
+    ya está tomado, lo que evita que corran dos workers a la vez.
+    """
+    return Listener(WORKER_CONTROL_ADDRESS, authkey=load_authkey())
+
+
+def serve(listener, handler):
+    """Atiende comandos uno a uno: handler(dict) -> dict"""
+    while True:
+        try:
+            with listener.accept() as conn:
+                message = conn.recv()
+                try:
+                    reply = handler(message)
+                except Exception as e:
+                    logger.error(f"❌ Error atendiendo comando {message}: {e}", exc_info=True)
+                    reply = {"error": str(e)}
+                conn.send(reply)
+        except AuthenticationError as e:
+            logger.warning(f"⚠️ Conexión de control rechazada (clave inválida): {e}")
+        except (EOFError, ConnectionError) as e:
+            logger.debug(f"Conexión de control cerrada: {e}")
@@ -0,0 +1,124 @@
+import base64
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime, timedelta
+from modules import storage
+
+EXPORT_COLUMNS = ["id", "person_id", "action", "timestamp", "camera_id"]
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def encode_cursor(last):
+    """Convierte (timestamp, id) en un cursor opaco apto para URL"""
+    timestamp, event_id = last
+    raw = f"{timestamp}|{event_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str):
+    """Inverso de encode_cursor. Lanza ValueError si el cursor no es válido"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        timestamp, event_id = raw.rsplit("|", 1)
+        return timestamp, int(event_id)
+    except Exception as e:
+        raise ValueError(f"Cursor inválido: {cursor}") from e
+
+
+def parse_range(start: str | None, end: str | None):
+    """
+    Normaliza el rango de fechas recibido por la API.
+    Acepta fechas (YYYY-MM-DD) o fechas con hora en ISO 8601.
+    Una fecha sola en 'end' incluye el día completo.
+    Las fechas con zona horaria (…Z, …+02:00) se convierten a hora local sin
+    zona, el mismo formato en que se guardan los eventos y los agregados.
+    Lanza ValueError si alguna fecha no es válida.
+    """
+    def _parse(value, is_end):
+        if not value:
+            return None
+        if len(value) == 10:
+            day = date.fromisoformat(value)
+            return (day + timedelta(days=1)).isoformat() if is_end else day.isoformat()
+        moment = datetime.fromisoformat(value)
+        if moment.tzinfo is not None:
+            moment = moment.astimezone().replace(tzinfo=None)
+        return moment.isoformat()
+
+    return _parse(start, False), _parse(end, True)
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """
+    Indica si el cliente acepta gzip según Accept-Encoding, respetando los
+    valores q (gzip;q=0 significa que lo rechaza). Un '*' cubre a gzip si
+    no aparece de forma explícita.
+    """
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qualities[coding] = q
+    if "gzip" in qualities:
+        return qualities["gzip"] > 0
+    return qualities.get("*", 0) > 0
+
+
+def _csv_chunks(blocks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in blocks:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate(0)
+    # Encabezado aunque no haya filas
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _ndjson_chunks(blocks):
+    for rows in blocks:
+        yield "".join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False) + "\n"
+            for row in rows
+        ).encode("utf-8")
+
+
+def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_events(fmt: str = "csv", compress: bool = False, **filters):
+    """
+    Generador de bytes con los eventos filtrados en formato CSV o NDJSON,
+    leídos por bloques desde un cursor de base de datos (memoria constante).
+    Si compress=True la salida va comprimida en gzip.
+    """
+    if fmt not in EXPORT_MEDIA_TYPES:
+        raise ValueError(f"Formato no soportado: {fmt}")
+
+    blocks = storage.iter_events(**filters)
+    chunks = _csv_chunks(blocks) if fmt == "csv" else _ndjson_chunks(blocks)
+    return _gzip_chunks(chunks) if compress else chunks
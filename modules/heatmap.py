@@ -0,0 +1,192 @@
+import time
+import zlib
+from datetime import date, datetime, timedelta
+import numpy as np
+from modules import storage
+
+
+def hour_key(timestamp: float = None) -> str:
+    """Hora local en formato 'YYYY-MM-DDTHH', clave de los agregados por hora"""
+    moment = datetime.now() if timestamp is None else datetime.fromtimestamp(timestamp)
+    return moment.strftime("%Y-%m-%dT%H")
+
+
+def encode_grid(grid: np.ndarray) -> bytes:
+    return zlib.compress(grid.astype(np.uint32).tobytes())
+
+
+def decode_grid(blob: bytes, rows: int, cols: int) -> np.ndarray:
+    return np.frombuffer(zlib.decompress(blob), dtype=np.uint32).reshape(rows, cols)
+
+
+def _load_bucket(period: str, camera_id: str, bucket: str, rows: int, cols: int):
+    """Retorna (grilla, entradas, salidas) guardados para el bucket, o ceros"""
+    grid = np.zeros((rows, cols), dtype=np.uint32)
+    # Rango [bucket, bucket + "~") = exactamente ese bucket
+    for _, _, entered, exited, blob, grid_rows, grid_cols in storage.get_traffic(period, camera_id, bucket, bucket + "~"):
+        if (grid_rows, grid_cols) == (rows, cols):
+            grid = decode_grid(blob, rows, cols).copy()
+        return grid, entered, exited
+    return grid, 0, 0
+
+
+class HourlyAccumulator:
+    """
+    Agregados de la hora en curso para una cámara: grilla reducida de
+    ocupación (una cuenta por centroide de track y frame) y entradas/salidas.
+    Se actualiza desde el hilo de captura (una suma por persona detectada) y
+    se persiste comprimida cada flush_seconds y al cambiar de hora, junto con
+    el acumulado del día (horas cerradas + hora en curso).
+    """
+
+    def __init__(self, camera_id: str, rows: int, cols: int, flush_seconds: float):
+        self.camera_id = camera_id
+        self.rows = rows
+        self.cols = cols
+        self.flush_seconds = flush_seconds
+        self.hour = None
+        self.last_flush = time.time()
+        self._load(hour_key(time.time()))
+
+    def _load(self, hour: str):
+        """Empieza la hora; si ya tenía datos (reinicio a mitad de hora) los continúa"""
+        self.hour = hour
+        self.grid, self.entered, self.exited = _load_bucket("hour", self.camera_id, hour, self.rows, self.cols)
+        # Base del día = acumulado diario sin lo que ya se había guardado de esta hora
+        day_grid, day_entered, day_exited = _load_bucket("day", self.camera_id, hour[:10], self.rows, self.cols)
+        self.day_grid = day_grid - np.minimum(day_grid, self.grid)
+        self.day_entered = max(0, day_entered - self.entered)
+        self.day_exited = max(0, day_exited - self.exited)
+
+    def add_point(self, x: int, y: int, width: int, height: int):
+        """Suma el centroide (x, y) de un frame de width x height a la grilla"""
+        gx = min(self.cols - 1, max(0, x * self.cols // width))
+        gy = min(self.rows - 1, max(0, y * self.rows // height))
+        self.grid[gy, gx] += 1
+
+    def add_event(self, action: str):
+        if action == "entered":
+            self.entered += 1
+        elif action == "exited":
+            self.exited += 1
+
+    def flush(self):
+        storage.save_traffic(
+            "hour", self.camera_id, self.hour, self.entered, self.exited,
+            encode_grid(self.grid), self.rows, self.cols,
+        )
+        storage.save_traffic(
+            "day", self.camera_id, self.hour[:10],
+            self.day_entered + self.entered, self.day_exited + self.exited,
+            encode_grid(self.day_grid + self.grid), self.rows, self.cols,
+        )
+        self.last_flush = time.time()
+
+    def tick(self):
+        """Llamado una vez por frame: cambia de hora y persiste periódicamente"""
+        now = time.time()
+        hour = hour_key(now)
+        if hour != self.hour:
+            self.flush()
+            self._load(hour)
+        elif now - self.last_flush >= self.flush_seconds:
+            self.flush()
+
+
+def _local(value):
+    """Fecha ISO con zona horaria → hora local sin zona, como los buckets"""
+    if not value or len(value) <= 10:
+        return value
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is not None:
+        moment = moment.astimezone().replace(tzinfo=None)
+    return moment.isoformat()
+
+
+def _split_range(start, end):
+    """
+    Divide [start, end) en días completos (agregados diarios) y los bordes
+    parciales (agregados por hora). Retorna (tramos por hora, tramo diario o None).
+    """
+    start, end = _local(start), _local(end)
+    first_day = date.fromisoformat(start[:10]) if start else None
+    if first_day is not None and datetime.fromisoformat(start) > datetime.fromisoformat(start[:10]):
+        first_day += timedelta(days=1)  # start a mitad de día: ese día va por horas
+    last_day = date.fromisoformat(end[:10]) if end else None  # exclusivo
+
+    if first_day is not None and last_day is not None and first_day >= last_day:
+        return [(start, end)], None
+
+    hourly = []
+    if first_day is not None and start < first_day.isoformat():
+        hourly.append((start, first_day.isoformat()))
+    if last_day is not None and end > last_day.isoformat():
+        hourly.append((last_day.isoformat(), end))
+    daily = (first_day and first_day.isoformat(), last_day and last_day.isoformat())
+    return hourly, daily
+
+
+def _hour_bounds(start, end):
+    """
+    Lleva [start, end) al formato de los buckets por hora ('YYYY-MM-DDTHH')
+    para que toda hora que se solape con el rango quede incluida: start se
+    trunca a su hora y end (exclusivo) se redondea hacia arriba.
+    """
+    if start:
+        start = start[:13]
+    if end and len(end) > 13:
+        moment = datetime.fromisoformat(end)
+        hour = moment.replace(minute=0, second=0, microsecond=0)
+        if hour < moment:
+            hour += timedelta(hours=1)
+        end = hour.strftime("%Y-%m-%dT%H")
+    return start, end
+
+
+def _aggregate_rows(camera_id, start, end):
+    """Filas de agregados que cubren [start, end) con la menor cantidad de grillas"""
+    hourly, daily = _split_range(start, end)
+    rows = []
+    if daily is not None:
+        rows.extend(storage.get_traffic("day", camera_id, *daily))
+    for hour_start, hour_end in hourly:
+        rows.extend(storage.get_traffic("hour", camera_id, *_hour_bounds(hour_start, hour_end)))
+    return rows
+
+
+def load_heatmap(camera_id=None, start=None, end=None):
+    """
+    Suma las grillas del rango: agregados diarios para los días completos y
+    por hora sólo en los bordes, así un mes lee ~30 grillas y no ~720.
+    Retorna (grilla, grillas sumadas) o (None, 0) si no hay datos.
+    Se ignoran grillas de otra resolución.
+    """
+    total, count = None, 0
+    for _, _, _, _, blob, rows, cols in _aggregate_rows(camera_id, start, end):
+        if blob is None:
+            continue
+        if total is None:
+            total = np.zeros((rows, cols), dtype=np.uint64)
+        if total.shape != (rows, cols):
+            continue
+        total += decode_grid(blob, rows, cols)
+        count += 1
+    return total, count
+
+
+def load_hourly_traffic(camera_id=None, start=None, end=None):
+    """
+    Entradas/salidas por hora desde los agregados (sin leer eventos crudos).
+    Retorna {"hours": [...serie cronológica...], "profile": [24 horas del día]}.
+    """
+    series = {}
+    profile = [{"hour": h, "entered": 0, "exited": 0} for h in range(24)]
+    start, end = _hour_bounds(_local(start), _local(end))
+    for _, hour, entered, exited, _, _, _ in storage.get_traffic("hour", camera_id, start, end, with_grid=False):
+        point = series.setdefault(hour, {"hour": hour, "entered": 0, "exited": 0})
+        point["entered"] += entered
+        point["exited"] += exited
+        bucket = profile[int(hour[11:13])]
+        bucket["entered"] += entered
+        bucket["exited"] += exited
+    return {"hours": list(series.values()), "profile": profile}
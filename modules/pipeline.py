@@ -0,0 +1,226 @@
+import logging
+import threading
+import time
+import cv2
+from ultralytics import YOLO
+from modules import notifications, checkpoint, alerts
+from modules.camera import CameraSupervisor, offline_frame
+from modules.clips import ClipBuffer, ClipWriter
+from modules.heatmap import HourlyAccumulator
+from modules.renditions import RateMeter, Rendition
+from modules.shared_state import FrameRing, SharedCounters
+from config import (
+    MODEL_PATH, CHECKPOINT_INTERVAL_SECONDS, FRAME_RING_SLOTS, FRAME_SLOT_BYTES,
+    CLIP_DIR, CLIP_PRE_SECONDS, CLIP_POST_SECONDS, CLIP_BUFFER_BYTES, CLIP_INDEX_SLOTS, CLIP_QUEUE_SIZE,
+    CLIP_RETENTION_DAYS, CLIP_MAX_BYTES, CLIP_PRUNE_INTERVAL,
+    HEATMAP_GRID_ROWS, HEATMAP_GRID_COLS, HEATMAP_FLUSH_SECONDS,
+    RENDITIONS, RENDITION_IDLE_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+IDLE_INTERVAL = 0.2  # latido mientras la cámara está apagada o en espera
+OFFLINE_FRAME_INTERVAL = 1.0  # cada cuánto se publica el frame "fuera de línea"
+
+
+# -----------------------------
+# 🔔 Notificaciones de estado
+# -----------------------------
+def notify_camera_status(status, details=None):
+    try:
+        if hasattr(notifications, "notify"):
+            notifications.notify({"camera_status": status, "details": details})
+        elif hasattr(notifications, "send"):
+            notifications.send({"camera_status": status, "details": details})
+    except Exception:
+        logger.debug("No se pudo enviar notificación de cámara.")
+
+
+class CameraPipeline:
+    """
+    YOLOv8 + tracking + conteo de una cámara, en su propio hilo dentro del
+    worker. Los frames los entrega un CameraSupervisor (dueño de la captura);
+    los resultados se publican en un FrameRing y los contadores en
+    SharedCounters para que los lea cualquier proceso de la API.
+    """
+
+    def __init__(self, camera_id: str, source, capture_factory=cv2.VideoCapture):
+        self.camera_id = camera_id
+        # Un modelo por cámara: model.track(persist=True) guarda el estado del tracker
+        self.model = YOLO(MODEL_PATH)
+
+        self.active = False  # control desde UI (comando toggle_camera)
+        self.status = "OFFLINE"  # "ONLINE", "OFFLINE", "RECONNECTING"
+        self.attempt = 0
+        self.camera = CameraSupervisor(camera_id, source, self.set_status, capture_factory)
+
+        # Posiciones del tracker y contadores restaurados del último checkpoint
+        self.last_positions = {}
+        self.counters = checkpoint.LiveCounters(camera_id)
+
+        self.frames = FrameRing.create(camera_id, FRAME_RING_SLOTS, FRAME_SLOT_BYTES)
+        self.full_quality = RENDITIONS["full"]["quality"]
+        self.full_meter = RateMeter()
+        # Renditions reducidas: cada una con su anillo, sólo se codifican con visores
+        self.renditions = [
+            Rendition(
+                camera_id, name, spec["scale"], spec["quality"], spec["max_fps"],
+                FRAME_RING_SLOTS, max(64_000, int(FRAME_SLOT_BYTES * spec["scale"] ** 2)),
+                RENDITION_IDLE_SECONDS,
+            )
+            for name, spec in RENDITIONS.items() if name != "full"
+        ]
+        self.shared = SharedCounters.create(camera_id)
+        self.checkpointer = checkpoint.Checkpointer(camera_id, self.counters.snapshot, CHECKPOINT_INTERVAL_SECONDS)
+        self.clip_buffer = ClipBuffer(CLIP_BUFFER_BYTES, CLIP_INDEX_SLOTS)
+        self.clip_writer = ClipWriter(
+            camera_id, self.clip_buffer, CLIP_DIR,
+            CLIP_PRE_SECONDS, CLIP_POST_SECONDS, CLIP_QUEUE_SIZE,
+            CLIP_RETENTION_DAYS, CLIP_MAX_BYTES, CLIP_PRUNE_INTERVAL,
+        )
+        self.traffic = HourlyAccumulator(camera_id, HEATMAP_GRID_ROWS, HEATMAP_GRID_COLS, HEATMAP_FLUSH_SECONDS)
+
+        self._stop = threading.Event()
+        self._thread = None
+        self.publish_state()
+
+    # -----------------------------
+    # 📡 Publicación hacia la API
+    # -----------------------------
+    def publish_state(self):
+        self.shared.publish(self.counters.read(), self.active, self.status, self.attempt)
+
+    def publish_frame(self, jpeg: bytes):
+        if not self.frames.publish(jpeg):
+            logger.warning(f"⚠️ Frame de {self.camera_id} excede {FRAME_SLOT_BYTES} bytes: descartado")
+        self.publish_state()
+
+    def set_status(self, status, attempt=0, details=None):
+        """Callback del supervisor en cada cambio de estado de la cámara"""
+        self.status, self.attempt = status, attempt
+        self.publish_state()
+        notify_camera_status(status, details)
+
+    # -----------------------------
+    # 🎛️ Comandos
+    # -----------------------------
+    def toggle(self):
+        self.active = not self.active
+        logger.info(f"✅ Cámara {self.camera_id} encendida" if self.active else f"🛑 Cámara {self.camera_id} apagada")
+        self.camera.set_active(self.active)
+        return self.shared.read()
+
+    # -----------------------------
+    # 📷 YOLOv8 + Tracking + Debounce
+    # -----------------------------
+    def _count(self, person_id, action):
+        now = time.time()
+        recorded = self.counters.record(person_id, action, now)
+        if recorded is None:
+            return  # debounce o duplicado descartado por la BD
+        # Sólo llegan aquí eventos guardados: todo cruce contado (incluidos los
+        # que superan el aforo) tiene su fila y su clip
+        event_id, inside = recorded
+        self.traffic.add_event(action)
+        logger.info(f"👤 Persona {person_id} { 'entró' if action == 'entered' else 'salió' } ({self.camera_id})")
+
+        self.clip_writer.request(event_id, now)
+        capacity_alert = alerts.check_capacity(inside) if action == "entered" else None
+        if capacity_alert:
+            logger.warning(f"{capacity_alert} ({self.camera_id}, clip del evento {event_id})")
+
+    def _process(self, frame, line_y):
+        try:
+            results = self.model.track(frame, persist=True, stream=True)
+        except Exception as e:
+            logger.error(f"❌ Error YOLO: {e}", exc_info=True)
+            return
+
+        for r in results:
+            if not hasattr(r, "boxes") or r.boxes is None:
+                continue
+            for box in r.boxes:
+                if not hasattr(box, "id") or box.id is None:
+                    continue
+                cls = int(box.cls[0])
+                if self.model.names[cls] != "person":
+                    continue
+
+                person_id = int(box.id[0])
+                x1, y1, x2, y2 = map(int, box.xyxy[0])
+                cy = (y1 + y2) // 2
+                self.traffic.add_point((x1 + x2) // 2, cy, frame.shape[1], frame.shape[0])
+
+                if person_id in self.last_positions:
+                    prev_y = self.last_positions[person_id]
+                    action = "entered" if prev_y > line_y and cy <= line_y else \
+                             "exited" if prev_y < line_y and cy >= line_y else None
+                    if action:
+                        self._count(person_id, action)
+
+                self.last_positions[person_id] = cy
+
+        cv2.line(frame, (0, line_y), (frame.shape[1], line_y), (255, 0, 0), 2)
+
+    def run(self):
+        seq, last_offline = 0, 0.0
+        while not self._stop.is_set():
+            if not self.active:
+                self.publish_state()  # latido
+                self._stop.wait(IDLE_INTERVAL)
+                continue
+
+            seq, frame = self.camera.latest(seq, timeout=IDLE_INTERVAL)
+            if frame is None:
+                # Sin frames: los visores reciben el frame "fuera de línea" compartido
+                if self.status != "ONLINE" and time.time() - last_offline >= OFFLINE_FRAME_INTERVAL:
+                    self.publish_frame(offline_frame())
+                    last_offline = time.time()
+                    for rendition in self.renditions:
+                        rendition.offer_offline(last_offline)
+                else:
+                    self.publish_state()  # latido
+                continue
+
+            line_y = frame.shape[0] // 2
+            self._process(frame, line_y)
+            self.traffic.tick()
+            _, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.full_quality])
+            jpeg = buffer.tobytes()
+            self.clip_buffer.append(jpeg)
+            self.publish_frame(jpeg)
+            now = time.time()
+            self.full_meter.add(len(jpeg), now)
+            for rendition in self.renditions:
+                rendition.offer(frame, now)
+
+    def stats(self) -> dict:
+        now = time.time()
+        renditions = {"full": {
+            **self.full_meter.stats(),
+            "subscribed": now - self.frames.viewed_at() <= RENDITION_IDLE_SECONDS,
+        }}
+        renditions.update({rendition.name: rendition.stats(now) for rendition in self.renditions})
+        return {"camera": self.camera.stats(), "clips": self.clip_writer.stats(), "renditions": renditions}
+
+    def start(self):
+        self.camera.start()
+        self.checkpointer.start()
+        self.clip_writer.start()
+        self._thread = threading.Thread(target=self.run, name=f"pipeline-{self.camera_id}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Detiene la captura, guarda el checkpoint final y libera la memoria compartida"""
+        self.active = False
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.camera.stop()
+        self.checkpointer.stop()
+        self.clip_writer.stop()
+        self.traffic.flush()
+        self.frames.close()
+        for rendition in self.renditions:
+            rendition.close()
+        self.shared.close()
@@ -0,0 +1,91 @@
+import time
+import cv2
+import numpy as np
+from modules.camera import offline_frame
+from modules.shared_state import FrameRing
+
+
+class RateMeter:
+    """Bytes/s y frames/s en ventanas fijas, sin guardar historial"""
+
+    def __init__(self, window: float = 2.0):
+        self.window = window
+        self.window_start = time.time()
+        self.bytes = 0
+        self.frames = 0
+        self.bytes_per_sec = 0.0
+        self.fps = 0.0
+
+    def add(self, size: int, now: float):
+        self.bytes += size
+        self.frames += 1
+        elapsed = now - self.window_start
+        if elapsed >= self.window:
+            self.bytes_per_sec = self.bytes / elapsed
+            self.fps = self.frames / elapsed
+            self.window_start, self.bytes, self.frames = now, 0, 0
+
+    def stats(self) -> dict:
+        # Sin frames durante dos ventanas → tasa cero
+        idle = time.time() - self.window_start > 2 * self.window
+        return {
+            "bytes_per_sec": 0.0 if idle else round(self.bytes_per_sec, 1),
+            "fps": 0.0 if idle else round(self.fps, 2),
+        }
+
+
+class Rendition:
+    """
+    Versión reducida del stream de una cámara (escala, calidad JPEG, FPS
+    máximo) con su propio FrameRing. Sólo se codifica mientras algún visor
+    esté suscrito, es decir, mientras haya un touch() reciente en el anillo.
+    """
+
+    def __init__(self, camera_id: str, name: str, scale: float, quality: int, max_fps,
+                 slots: int, slot_size: int, idle_seconds: float):
+        self.name = name
+        self.scale = scale
+        self.quality = quality
+        self.min_interval = 1.0 / max_fps if max_fps else 0.0
+        self.idle_seconds = idle_seconds
+        self.ring = FrameRing.create(camera_id, slots, slot_size, name)
+        self.meter = RateMeter()
+        self.last_encode = 0.0
+        self._offline = None  # frame "fuera de línea" ya escalado y codificado
+
+    def subscribed(self, now: float) -> bool:
+        return now - self.ring.viewed_at() <= self.idle_seconds
+
+    def _encode(self, frame) -> bytes:
+        if self.scale != 1.0:
+            frame = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        _, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        return buffer.tobytes()
+
+    def _publish(self, jpeg: bytes, now: float):
+        if self.ring.publish(jpeg):
+            self.meter.add(len(jpeg), now)
+        self.last_encode = now
+
+    def _due(self, now: float) -> bool:
+        return self.subscribed(now) and now - self.last_encode >= self.min_interval
+
+    def offer(self, frame, now: float):
+        """Codifica y publica el frame si hay visores y no se supera el FPS máximo"""
+        if self._due(now):
+            self._publish(self._encode(frame), now)
+
+    def offer_offline(self, now: float):
+        """Publica el frame "fuera de línea" compartido, escalado una sola vez"""
+        if not self._due(now):
+            return
+        if self._offline is None:
+            frame = cv2.imdecode(np.frombuffer(offline_frame(), dtype=np.uint8), cv2.IMREAD_COLOR)
+            self._offline = self._encode(frame)
+        self._publish(self._offline, now)
+
+    def stats(self, now: float) -> dict:
+        return {**self.meter.stats(), "subscribed": self.subscribed(now)}
+
+    def close(self):
+        self.ring.close()
@@ -0,0 +1,189 @@
+import os
+import struct
+import time
+from multiprocessing import shared_memory
+
+# Estados de cámara publicados por el worker (índice = código en memoria compartida)
+STATUS_CODES = ("OFFLINE", "ONLINE", "RECONNECTING")
+
+
+def frames_segment_name(camera_id: str, rendition: str = "full") -> str:
+    if rendition == "full":
+        return f"smc_{camera_id}_frames"
+    return f"smc_{camera_id}_{rendition}_frames"
+
+
+def state_segment_name(camera_id: str) -> str:
+    return f"smc_{camera_id}_state"
+
+
+def _create(name: str, size: int):
+    """Crea el segmento; si quedó uno huérfano de un worker anterior, lo reemplaza"""
+    try:
+        return shared_memory.SharedMemory(name=name, create=True, size=size)
+    except FileExistsError:
+        stale = shared_memory.SharedMemory(name=name)
+        stale.close()
+        stale.unlink()
+        return shared_memory.SharedMemory(name=name, create=True, size=size)
+
+
+def _attach(name: str):
+    """
+    Se conecta a un segmento existente sin registrarlo en el resource_tracker:
+    el lector no es dueño del segmento y no debe borrarlo al terminar.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        if os.name == "posix":
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+class FrameRing:
+    """
+    Anillo de frames JPEG en memoria compartida: un escritor (worker) y
+    cualquier número de lectores (procesos de la API).
+
+    Diseño: encabezado (último seq, slots, tamaño de slot, instante del
+    último frame, último latido de un visor) + N slots de tamaño fijo, cada
+    uno con su propio (seq, longitud). El escritor llena el slot y después
+    publica el seq; el lector copia el frame directamente desde la memoria
+    compartida y valida que el escritor no haya dado la vuelta al anillo
+    mientras copiaba. Los lectores marcan touch() para que el escritor sepa
+    que alguien está suscrito.
+    """
+
+    HEADER = struct.Struct("<QII")
+    TIMES = struct.Struct("<dd")  # publicado, visto
+    TIMES_OFFSET = HEADER.size
+    SLOTS_OFFSET = HEADER.size + TIMES.size
+    SLOT_HEADER = struct.Struct("<QI4x")
+
+    def __init__(self, shm, owner: bool):
+        self.shm = shm
+        self.owner = owner
+        self._seq, self.slots, self.slot_size = self.HEADER.unpack_from(shm.buf, 0)
+
+    @classmethod
+    def create(cls, camera_id: str, slots: int, slot_size: int, rendition: str = "full"):
+        size = cls.SLOTS_OFFSET + slots * (cls.SLOT_HEADER.size + slot_size)
+        shm = _create(frames_segment_name(camera_id, rendition), size)
+        cls.HEADER.pack_into(shm.buf, 0, 0, slots, slot_size)
+        cls.TIMES.pack_into(shm.buf, cls.TIMES_OFFSET, 0.0, 0.0)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, camera_id: str, rendition: str = "full"):
+        return cls(_attach(frames_segment_name(camera_id, rendition)), owner=False)
+
+    def _slot_offset(self, seq: int) -> int:
+        return self.SLOTS_OFFSET + (seq % self.slots) * (self.SLOT_HEADER.size + self.slot_size)
+
+    def latest_seq(self) -> int:
+        return self.HEADER.unpack_from(self.shm.buf, 0)[0]
+
+    def published_at(self) -> float:
+        """Instante (time.time) en que se publicó el último frame"""
+        return self.TIMES.unpack_from(self.shm.buf, self.TIMES_OFFSET)[0]
+
+    def viewed_at(self) -> float:
+        """Último latido de un visor suscrito a este anillo"""
+        return self.TIMES.unpack_from(self.shm.buf, self.TIMES_OFFSET)[1]
+
+    def touch(self):
+        """Marca que hay un visor suscrito (lo llaman los lectores)"""
+        struct.pack_into("<d", self.shm.buf, self.TIMES_OFFSET + 8, time.time())
+
+    def publish(self, data: bytes) -> bool:
+        """Escribe un frame. Retorna False si no cabe en un slot"""
+        if len(data) > self.slot_size:
+            return False
+        seq = self._seq + 1
+        offset = self._slot_offset(seq)
+        start = offset + self.SLOT_HEADER.size
+        self.shm.buf[start:start + len(data)] = data
+        self.SLOT_HEADER.pack_into(self.shm.buf, offset, seq, len(data))
+        self.HEADER.pack_into(self.shm.buf, 0, seq, self.slots, self.slot_size)
+        struct.pack_into("<d", self.shm.buf, self.TIMES_OFFSET, time.time())
+        self._seq = seq
+        return True
+
+    def read(self, after_seq: int = 0):
+        """
+        Retorna (seq, bytes) del frame más reciente si es posterior a after_seq,
+        o (after_seq, None) si todavía no hay un frame nuevo.
+
+        El frame se copia una vez (sin pasar por el worker ni por pickle). No
+        se entrega un memoryview del slot: la respuesta HTTP lo envía después,
+        de forma asíncrona, y para entonces el escritor pudo haber reutilizado
+        el slot, con lo que el cliente recibiría un frame mezclado. La copia es
+        la que valida la regla del seq.
+        """
+        for _ in range(3):
+            seq = self.latest_seq()
+            if seq <= after_seq:
+                return after_seq, None
+            offset = self._slot_offset(seq)
+            slot_seq, length = self.SLOT_HEADER.unpack_from(self.shm.buf, offset)
+            start = offset + self.SLOT_HEADER.size
+            data = bytes(self.shm.buf[start:start + length])
+            # Válido si el slot sigue siendo el mismo y el escritor no empezó a reutilizarlo
+            if slot_seq == seq and self.latest_seq() - seq <= self.slots - 2:
+                return seq, data
+        return after_seq, None
+
+    def close(self):
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class SharedCounters:
+    """
+    Segmento pequeño con los contadores y el estado de una cámara,
+    escrito por el worker y leído por los procesos de la API.
+    """
+
+    LAYOUT = struct.Struct("<qqqqqqd")  # inside, entered, exited, active, status, attempt, heartbeat
+
+    def __init__(self, shm, owner: bool):
+        self.shm = shm
+        self.owner = owner
+
+    @classmethod
+    def create(cls, camera_id: str):
+        shm = _create(state_segment_name(camera_id), cls.LAYOUT.size)
+        cls.LAYOUT.pack_into(shm.buf, 0, 0, 0, 0, 0, 0, 0, time.time())
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, camera_id: str):
+        return cls(_attach(state_segment_name(camera_id)), owner=False)
+
+    def publish(self, state: dict, active: bool, status: str, attempt: int = 0):
+        self.LAYOUT.pack_into(
+            self.shm.buf, 0,
+            state["inside"], state["entered"], state["exited"],
+            int(active), STATUS_CODES.index(status), attempt, time.time(),
+        )
+
+    def read(self) -> dict:
+        inside, entered, exited, active, status, attempt, heartbeat = self.LAYOUT.unpack_from(self.shm.buf, 0)
+        camera_status = STATUS_CODES[status]
+        if camera_status == "RECONNECTING":
+            camera_status = f"RECONNECTING (attempt {attempt})"
+        return {
+            "state": {"inside": inside, "entered": entered, "exited": exited},
+            "camera_active": bool(active),
+            "camera_status": camera_status,
+            "heartbeat": heartbeat,
+        }
+
+    def close(self):
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
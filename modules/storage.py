@@ -1,20 +1,34 @@
+import json
 import sqlite3
 from datetime import datetime
-from config import DB_PATH
+from config import DB_PATH, DEFAULT_CAMERA_ID, EXPORT_CHUNK_SIZE
 
 
 def ensure_schema():
     """
-    Garantiza que la tabla 'events' tenga la columna person_id,
-    incluso si la base ya existía de antes sin esa columna.
+    Garantiza que la tabla 'events' tenga las columnas person_id, camera_id
+    y clip_path, y 'active_sessions' la columna camera_id, incluso si la base
+    ya existía de antes sin esas columnas.
+    Las filas viejas sin cámara se asignan a DEFAULT_CAMERA_ID.
     """
     conn = sqlite3.connect(DB_PATH)
     cur = conn.cursor()
-    try:
-        cur.execute("ALTER TABLE events ADD COLUMN person_id INTEGER")
-    except sqlite3.OperationalError:
-        # La columna ya existe o la tabla aún no está creada → no pasa nada
-        pass
+    migrations = (
+        ("events", "person_id INTEGER"), ("events", "camera_id TEXT"), ("events", "clip_path TEXT"),
+        ("active_sessions", "camera_id TEXT"),
+    )
+    for table, column in migrations:
+        try:
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN {column}")
+        except sqlite3.OperationalError:
+            # La columna ya existe o la tabla aún no está creada → no pasa nada
+            continue
+        if column.startswith("camera_id"):
+            # Filas anteriores a la columna camera_id: eran de la única cámara.
+            # Sólo en la migración: recorre toda la tabla.
+            cur.execute(f"UPDATE {table} SET camera_id = ? WHERE camera_id IS NULL", (DEFAULT_CAMERA_ID,))
+    # Índice para la paginación por cursor (keyset) sobre (timestamp, id)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_events_timestamp_id ON events (timestamp, id)")
     conn.commit()
     conn.close()
 
@@ -22,42 +36,74 @@ def ensure_schema():
 def init_db():
     conn = sqlite3.connect(DB_PATH)
     cur = conn.cursor()
+    # WAL: las exportaciones largas (lectores) no bloquean save_event (escritor)
+    cur.execute("PRAGMA journal_mode=WAL")
     cur.execute("""
     CREATE TABLE IF NOT EXISTS events (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         person_id INTEGER,
         action TEXT,
-        timestamp TEXT
+        timestamp TEXT,
+        camera_id TEXT,
+        clip_path TEXT
     )
     """)
     cur.execute("""
     CREATE TABLE IF NOT EXISTS active_sessions (
         person_id INTEGER PRIMARY KEY,
-        entry_time TEXT
+        entry_time TEXT,
+        camera_id TEXT
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS counter_checkpoints (
+        camera_id TEXT PRIMARY KEY,
+        last_event_id INTEGER,
+        inside INTEGER,
+        entered INTEGER,
+        exited INTEGER,
+        tracker_state TEXT,
+        updated_at TEXT
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS traffic_aggregates (
+        period TEXT,
+        camera_id TEXT,
+        bucket TEXT,
+        entered INTEGER,
+        exited INTEGER,
+        grid BLOB,
+        grid_rows INTEGER,
+        grid_cols INTEGER,
+        PRIMARY KEY (period, camera_id, bucket)
     )
     """)
     conn.commit()
     conn.close()
 
-    # 🔹 Garantizar que person_id exista
+    # 🔹 Garantizar que person_id, camera_id y clip_path existan
     ensure_schema()
 
 
-def save_event(action: str, person_id: int = None):
+def save_event(action: str, person_id: int = None, camera_id: str = DEFAULT_CAMERA_ID):
     """
     Guarda evento en la tabla 'events'.
     Maneja automáticamente sesiones activas para evitar duplicados.
+    Retorna el id del evento insertado, o None si se descartó por duplicado.
     """
     conn = sqlite3.connect(DB_PATH)
     cur = conn.cursor()
     now = datetime.now().isoformat()
+    event_id = None
 
     if action == "entered":
         # Solo registrar entrada si no existe sesión activa
         cur.execute("SELECT person_id FROM active_sessions WHERE person_id = ?", (person_id,))
         if cur.fetchone() is None:
-            cur.execute("INSERT INTO active_sessions (person_id, entry_time) VALUES (?, ?)", (person_id, now))
-            cur.execute("INSERT INTO events (person_id, action, timestamp) VALUES (?, ?, ?)", (person_id, action, now))
+            cur.execute("INSERT INTO active_sessions (person_id, entry_time, camera_id) VALUES (?, ?, ?)", (person_id, now, camera_id))
+            cur.execute("INSERT INTO events (person_id, action, timestamp, camera_id) VALUES (?, ?, ?, ?)", (person_id, action, now, camera_id))
+            event_id = cur.lastrowid
 
     elif action == "exited":
         # Solo registrar salida si hay sesión activa
@@ -65,12 +111,254 @@ def save_event(action: str, person_id: int = None):
         row = cur.fetchone()
         if row:
             cur.execute("DELETE FROM active_sessions WHERE person_id = ?", (person_id,))
-            cur.execute("INSERT INTO events (person_id, action, timestamp) VALUES (?, ?, ?)", (person_id, action, now))
+            cur.execute("INSERT INTO events (person_id, action, timestamp, camera_id) VALUES (?, ?, ?, ?)", (person_id, action, now, camera_id))
+            event_id = cur.lastrowid
+
+    conn.commit()
+    conn.close()
+    return event_id
+
+
+def set_event_clip(event_id: int, clip_path: str):
+    """Asocia el clip de video guardado en disco al evento"""
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+    cur.execute("UPDATE events SET clip_path = ? WHERE id = ?", (clip_path, event_id))
+    conn.commit()
+    conn.close()
+
+
+def clear_event_clips(event_ids):
+    """Desasocia los clips borrados por la retención de sus eventos"""
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+    cur.executemany("UPDATE events SET clip_path = NULL WHERE id = ?", [(event_id,) for event_id in event_ids])
+    conn.commit()
+    conn.close()
+
+
+def get_event_clip(event_id: int):
+    """Ruta del clip del evento, o None si no tiene"""
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+    cur.execute("SELECT clip_path FROM events WHERE id = ?", (event_id,))
+    row = cur.fetchone()
+    conn.close()
+    return row[0] if row else None
+
+
+def save_checkpoint(camera_id: str, counters: dict, last_event_id: int, tracker_state: dict):
+    """
+    Guarda (reemplaza) el checkpoint de contadores de una cámara.
+    last_event_id es el último evento ya contabilizado en 'counters'.
+    """
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+    cur.execute(
+        "INSERT OR REPLACE INTO counter_checkpoints "
+        "(camera_id, last_event_id, inside, entered, exited, tracker_state, updated_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (camera_id, last_event_id, counters["inside"], counters["entered"],
+         counters["exited"], json.dumps(tracker_state), datetime.now().isoformat()),
+    )
+    conn.commit()
+    conn.close()
+
+
+def load_checkpoint(camera_id: str):
+    """Devuelve el último checkpoint de la cámara como dict, o None si no existe"""
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT last_event_id, inside, entered, exited, tracker_state, updated_at "
+        "FROM counter_checkpoints WHERE camera_id = ?",
+        (camera_id,),
+    )
+    row = cur.fetchone()
+    conn.close()
+    if row is None:
+        return None
+    last_event_id, inside, entered, exited, tracker_state, updated_at = row
+    return {
+        "last_event_id": last_event_id,
+        "counters": {"inside": inside, "entered": entered, "exited": exited},
+        "tracker_state": json.loads(tracker_state) if tracker_state else {},
+        "updated_at": updated_at,
+    }
+
+
+def get_events_since(camera_id: str, last_event_id: int):
+    """
+    Cuenta por acción los eventos de la cámara con id > last_event_id.
+    Usa el rango de la clave primaria: el costo depende sólo de los eventos
+    posteriores al checkpoint, no del tamaño del historial.
+    Retorna ({acción: cantidad}, id del último evento).
+    """
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT action, COUNT(*), MAX(id) FROM events "
+        "WHERE id > ? AND camera_id = ? GROUP BY action",
+        (last_event_id, camera_id),
+    )
+    rows = cur.fetchall()
+    conn.close()
+    counts = {action: count for action, count, _ in rows}
+    max_id = max((row[2] for row in rows), default=last_event_id)
+    return counts, max_id
+
+
+def get_bootstrap_state(camera_id: str):
+    """
+    Punto de partida cuando una cámara aún no tiene checkpoint:
+    el id del último evento (para no re-escanear el historial) y
+    las personas con sesión activa en esa cámara (siguen adentro).
+    """
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+    cur.execute("SELECT COALESCE(MAX(id), 0) FROM events")
+    last_event_id = cur.fetchone()[0]
+    cur.execute("SELECT COUNT(*) FROM active_sessions WHERE camera_id = ?", (camera_id,))
+    inside = cur.fetchone()[0]
+    conn.close()
+    return last_event_id, inside
 
+
+def save_traffic(period: str, camera_id: str, bucket: str, entered: int, exited: int,
+                 grid: bytes, grid_rows: int, grid_cols: int):
+    """
+    Guarda (reemplaza) el agregado de tráfico de una cámara para un periodo:
+    period 'hour' (bucket 'YYYY-MM-DDTHH') o 'day' (bucket 'YYYY-MM-DD'),
+    con entradas, salidas y la grilla de ocupación comprimida.
+    """
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+    cur.execute(
+        "INSERT OR REPLACE INTO traffic_aggregates "
+        "(period, camera_id, bucket, entered, exited, grid, grid_rows, grid_cols) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (period, camera_id, bucket, entered, exited, grid, grid_rows, grid_cols),
+    )
     conn.commit()
     conn.close()
 
 
+def get_traffic(period: str, camera_id=None, start=None, end=None, with_grid=True):
+    """
+    Devuelve los agregados del periodo en orden cronológico como tuplas
+    (camera_id, bucket, entered, exited, grid, grid_rows, grid_cols).
+    start es inclusivo y end exclusivo; camera_id=None incluye todas las cámaras.
+    Con with_grid=False no se leen las grillas (grid es None).
+    """
+    clauses, params = ["period = ?"], [period]
+    if camera_id:
+        clauses.append("camera_id = ?")
+        params.append(camera_id)
+    if start:
+        clauses.append("bucket >= ?")
+        params.append(start)
+    if end:
+        clauses.append("bucket < ?")
+        params.append(end)
+    grid_column = "grid" if with_grid else "NULL"
+
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+    cur.execute(
+        f"SELECT camera_id, bucket, entered, exited, {grid_column}, grid_rows, grid_cols "
+        f"FROM traffic_aggregates WHERE {' AND '.join(clauses)} ORDER BY bucket",
+        params,
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+def _event_filters(start=None, end=None, action=None, person_id=None, camera_id=None):
+    """
+    Construye las condiciones WHERE comunes a la consulta y la exportación.
+    start es inclusivo y end exclusivo (cadenas ISO comparables con timestamp).
+    """
+    clauses, params = [], []
+    if start:
+        clauses.append("timestamp >= ?")
+        params.append(start)
+    if end:
+        clauses.append("timestamp < ?")
+        params.append(end)
+    if action:
+        clauses.append("action = ?")
+        params.append(action)
+    if person_id is not None:
+        clauses.append("person_id = ?")
+        params.append(person_id)
+    if camera_id:
+        clauses.append("camera_id = ?")
+        params.append(camera_id)
+    return clauses, params
+
+
+def query_events(start=None, end=None, action=None, person_id=None, camera_id=None,
+                 after=None, limit=100):
+    """
+    Devuelve una página de eventos ordenada por (timestamp, id).
+    after: tupla (timestamp, id) del último evento de la página anterior.
+    Paginación por cursor (keyset): el costo no crece con la profundidad de la página.
+    Retorna (filas, último (timestamp, id) o None si no hay más páginas).
+    """
+    clauses, params = _event_filters(start, end, action, person_id, camera_id)
+    if after is not None:
+        clauses.append("(timestamp, id) > (?, ?)")
+        params.extend(after)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    cur = conn.cursor()
+    cur.execute(
+        f"SELECT id, person_id, action, timestamp, camera_id, clip_path FROM events {where} "
+        "ORDER BY timestamp, id LIMIT ?",
+        (*params, limit + 1),
+    )
+    rows = [dict(row) for row in cur.fetchall()]
+    conn.close()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    last = (rows[-1]["timestamp"], rows[-1]["id"]) if has_more else None
+    return rows, last
+
+
+def iter_events(start=None, end=None, action=None, person_id=None, camera_id=None,
+                chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Recorre los eventos filtrados con un cursor del lado del servidor,
+    entregando bloques de como máximo chunk_size tuplas
+    (id, person_id, action, timestamp, camera_id).
+    La memoria usada es constante sin importar el número total de filas.
+    """
+    clauses, params = _event_filters(start, end, action, person_id, camera_id)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    # El generador puede avanzar desde distintos hilos del threadpool,
+    # pero nunca en paralelo: es seguro desactivar check_same_thread.
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            f"SELECT id, person_id, action, timestamp, camera_id FROM events {where} "
+            "ORDER BY timestamp, id",
+            params,
+        )
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        conn.close()
+
+
 def get_stats():
     conn = sqlite3.connect(DB_PATH)
     cur = conn.cursor()
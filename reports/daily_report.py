@@ -6,6 +6,7 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Tabl
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from config import DB_PATH
+from utils.plots import analytics_section
 
 def header_footer(canvas, doc):
     # Encabezado
@@ -93,6 +94,11 @@ def generate_daily_report():
         story.append(Paragraph(f"Total de salidas: <b>{total_salidas}</b>", normal_style))
         story.append(Paragraph(f"Balance (Ingresos - Salidas): <b>{balance}</b>", normal_style))
 
+    # Tráfico por hora y mapa de calor (desde agregados precalculados)
+    story.extend(analytics_section(
+        today.isoformat(), (today + datetime.timedelta(days=1)).isoformat(), normal_style
+    ))
+
     # Construir PDF
     doc.build(story, onFirstPage=header_footer, onLaterPages=header_footer)
 
@@ -0,0 +1,17 @@
+import os
+import sys
+import pytest
+
+# Las pruebas importan los módulos del proyecto igual que main.py y worker.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules import storage  # noqa: E402
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """Base de datos temporal inicializada, en lugar de data/"""
+    path = str(tmp_path / "test.db")
+    monkeypatch.setattr(storage, "DB_PATH", path)
+    storage.init_db()
+    return path
@@ -0,0 +1,78 @@
+"""
+Pruebas HTTP de la API. Requieren las dependencias completas de main.py
+(FastAPI, httpx para TestClient y reportlab para los reportes).
+"""
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+pytest.importorskip("reportlab")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+
+@pytest.fixture
+def client(db_path):
+    import main
+    # Sin "with": no corre el startup, así que no se lanza el worker
+    return TestClient(main.app)
+
+
+def test_events_pages_with_cursor(client):
+    from modules import storage
+    for person_id in range(5):
+        storage.save_event("entered", person_id)
+
+    ids, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        body = client.get("/events", params=params).json()
+        ids += [event["id"] for event in body["events"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert ids == [1, 2, 3, 4, 5]
+
+
+def test_bad_cursor_is_400(client):
+    response = client.get("/events", params={"cursor": "no-es-un-cursor"})
+    assert response.status_code == 400
+    assert "Cursor" in response.json()["error"]
+
+
+def test_export_respects_gzip_q_zero(client):
+    response = client.get("/events/export", headers={"Accept-Encoding": "gzip;q=0"})
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert response.text.startswith("id,person_id,action,timestamp,camera_id")
+
+
+def test_video_generator_is_async_and_respects_fps(client, monkeypatch):
+    import asyncio
+    import inspect
+    import time
+    import main
+
+    assert inspect.isasyncgenfunction(main.generate_video)
+
+    class Ring:
+        seq = 0
+
+        def touch(self):
+            pass
+
+        def read(self, after):
+            self.seq += 1  # siempre hay un frame nuevo (fuente a máxima velocidad)
+            return self.seq, b"jpeg"
+
+    ring, deadline = Ring(), time.time() + 1.2
+    monkeypatch.setattr(main, "frame_ring", lambda camera_id, rendition: ring)
+    monkeypatch.setattr(main, "camera_status", lambda camera_id: {"camera_active": time.time() < deadline})
+    monkeypatch.setattr(main.time, "sleep", lambda seconds: pytest.fail("bloquea un hilo"))
+
+    async def consume():
+        return [chunk async for chunk in main.generate_video("cam0", "low")]
+
+    frames = asyncio.run(consume())
+    max_fps = main.RENDITIONS["low"]["max_fps"]
+    assert 1 <= len(frames) <= max_fps * 1.2 + 1
@@ -0,0 +1,198 @@
+"""
+CameraSupervisor con una fuente falsa que falla según un plan: cada
+apertura de la captura toma el siguiente comportamiento de la lista.
+"""
+import threading
+import time
+import numpy as np
+import pytest
+from modules import camera
+from modules.camera import CameraSupervisor
+
+FAST = dict(base_backoff=0.05, max_backoff=0.4, stall_seconds=0.3, watchdog_interval=0.02)
+
+
+class FakeCapture:
+    """
+    closed: no abre · fail: abre pero read() falla · frames: frames distintos
+    freeze: siempre el mismo frame · hang: read() queda bloqueado
+    """
+
+    def __init__(self, behavior, unblock):
+        self.behavior = behavior
+        self.unblock = unblock
+        self.count = 0
+        self.released = threading.Event()
+
+    def isOpened(self):
+        return self.behavior != "closed"
+
+    def read(self):
+        if self.behavior == "fail":
+            return False, None
+        if self.behavior == "hang":
+            self.unblock.wait()
+            return False, None
+        time.sleep(0.005)
+        if self.behavior == "freeze":
+            return True, np.full((64, 64, 3), 7, dtype=np.uint8)
+        self.count += 1
+        return True, np.full((64, 64, 3), self.count % 256, dtype=np.uint8)
+
+    def release(self):
+        self.released.set()
+
+
+class Source:
+    """capture_factory que sigue el plan y registra cada apertura"""
+
+    def __init__(self, *plan, then="frames"):
+        self.plan = list(plan)
+        self.then = then
+        self.opens = []
+        self.captures = []
+        self.unblock = threading.Event()
+
+    def __call__(self, source):
+        self.opens.append(time.monotonic())
+        behavior = self.plan.pop(0) if self.plan else self.then
+        capture = FakeCapture(behavior, self.unblock)
+        self.captures.append(capture)
+        return capture
+
+
+@pytest.fixture
+def supervise():
+    started = []
+
+    def _start(source, **overrides):
+        statuses = []
+        supervisor = CameraSupervisor(
+            "cam_test", 0, lambda status, attempt, details: statuses.append((status, attempt)),
+            source, **{**FAST, **overrides},
+        )
+        supervisor.start()
+        supervisor.set_active(True)
+        started.append((supervisor, source))
+        return supervisor, statuses
+
+    yield _start
+    for supervisor, source in started:
+        source.unblock.set()
+        supervisor.stop()
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+def test_open_failures_back_off_with_growing_jitter(supervise, monkeypatch):
+    windows = []
+    uniform = camera.random.uniform
+    monkeypatch.setattr(camera.random, "uniform", lambda a, b: windows.append((a, b)) or uniform(a, b))
+
+    source = Source("closed", "closed", "closed", "closed")
+    supervisor, statuses = supervise(source)
+    assert wait_for(lambda: supervisor.status == "ONLINE")
+
+    assert statuses == [("RECONNECTING", 1), ("RECONNECTING", 2), ("RECONNECTING", 3),
+                        ("RECONNECTING", 4), ("ONLINE", 0)]
+    assert windows == [(0.025, 0.05), (0.05, 0.1), (0.1, 0.2), (0.2, 0.4)]
+    gaps = np.diff(source.opens)
+    assert all(gap >= low for gap, (low, _) in zip(gaps, windows))
+    assert supervisor.reconnects == 1
+
+
+def test_read_failures_reconnect_with_backoff(supervise):
+    source = Source("fail", "fail", "fail")
+    supervisor, statuses = supervise(source)
+    assert wait_for(lambda: supervisor.status == "ONLINE")
+
+    # Abrir no basta: ONLINE sólo después del primer frame real
+    assert statuses == [("RECONNECTING", 1), ("RECONNECTING", 2), ("RECONNECTING", 3), ("ONLINE", 0)]
+    assert len(source.opens) == 4
+    gaps = np.diff(source.opens)
+    assert gaps[1] >= 0.05 and gaps[2] >= 0.1
+    assert supervisor.reconnects == 1
+
+
+def test_read_always_failing_is_throttled(supervise):
+    source = Source(then="fail")
+    supervisor, statuses = supervise(source)
+    time.sleep(1.0)
+
+    # 0.05 + 0.1 + 0.2 + 0.4 + ... como máximo: nada de reabrir cada watchdog_interval
+    assert 3 <= len(source.opens) <= 7
+    assert len(statuses) == len(source.opens)
+    assert all(status == "RECONNECTING" for status, _ in statuses)
+    stats = supervisor.stats()
+    assert stats["status"] == "RECONNECTING"
+    assert stats["reconnects"] == 0
+    assert stats["frames_read"] == 0
+    assert stats["last_frame_age"] is None
+
+
+def test_frozen_frames_count_as_stall(supervise):
+    source = Source("freeze")
+    supervisor, statuses = supervise(source)
+    assert wait_for(lambda: supervisor.stalls == 1)
+    assert wait_for(lambda: len(source.opens) == 2 and supervisor.status == "ONLINE")
+
+    assert statuses == [("ONLINE", 0), ("RECONNECTING", 1), ("ONLINE", 0)]
+    assert supervisor.reconnects == 1
+
+
+def test_hung_read_is_abandoned(supervise):
+    source = Source("hang")
+    supervisor, statuses = supervise(source)
+    assert wait_for(lambda: supervisor.status == "ONLINE")
+
+    assert supervisor.stalls == 1
+    assert statuses == [("RECONNECTING", 1), ("ONLINE", 0)]
+    hung = source.captures[0]
+    assert not hung.released.is_set()  # su lector sigue bloqueado en read()
+
+    seq, frame = supervisor.latest(0, timeout=1)
+    assert frame is not None
+
+    source.unblock.set()
+    assert hung.released.wait(1)  # al volver de read(), el lector libera su captura
+
+
+def test_last_frame_age_is_none_until_first_frame(supervise):
+    source = Source("hang")
+    supervisor, _ = supervise(source)
+    time.sleep(0.1)
+    assert supervisor.stats()["last_frame_age"] is None
+    assert supervisor.status == "OFFLINE"  # abierta pero sin frames todavía
+
+
+def test_set_active_false_stops_promptly(supervise):
+    source = Source()
+    supervisor, statuses = supervise(source)
+    assert wait_for(lambda: supervisor.status == "ONLINE")
+
+    supervisor.set_active(False)
+    assert supervisor.status == "OFFLINE"
+    assert wait_for(lambda: source.captures[-1].released.is_set(), timeout=0.5)
+    opens = len(source.opens)
+    time.sleep(0.2)
+    assert len(source.opens) == opens
+
+
+def test_set_active_false_interrupts_backoff(supervise):
+    source = Source(then="closed")
+    supervisor, _ = supervise(source, base_backoff=10, max_backoff=10)
+    assert wait_for(lambda: supervisor.status == "RECONNECTING")
+
+    t0 = time.monotonic()
+    supervisor.set_active(False)
+    supervisor.stop()
+    assert time.monotonic() - t0 < 0.5
+    assert supervisor.status == "OFFLINE"
+    assert len(source.opens) == 1
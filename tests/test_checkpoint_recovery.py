@@ -0,0 +1,156 @@
+"""
+Recuperación de contadores tras matar el proceso del worker (SIGKILL):
+el proceso hijo cuenta cruces con LiveCounters + Checkpointer como lo hace
+CameraPipeline, se lo mata sin apagado limpio y otro proceso restaura.
+"""
+import multiprocessing as mp
+import os
+import signal
+import sqlite3
+import time
+import pytest
+from modules import storage, checkpoint
+
+CAMERA_ID = "cam0"
+ctx = mp.get_context("spawn")
+
+pytestmark = pytest.mark.skipif(not hasattr(signal, "SIGKILL"), reason="requiere SIGKILL")
+
+
+def _counting_service(db_path, interval, before, after, ready):
+    """
+    'before' cruces antes del último checkpoint y 'after' cruces después.
+    Con interval=None no hay checkpoints periódicos: sólo el explícito.
+    """
+    storage.DB_PATH = db_path
+    counters = checkpoint.LiveCounters(CAMERA_ID)
+    checkpointer = checkpoint.Checkpointer(CAMERA_ID, counters.snapshot, interval or 3600)
+    checkpointer.start()
+    for person_id, action in before:
+        counters.record(person_id, action)
+    if interval is None:
+        checkpointer.checkpoint_now()
+    for person_id, action in after:
+        counters.record(person_id, action)
+    ready.set()
+    time.sleep(3600)  # sigue "vivo" hasta que lo maten
+
+
+def _live_then_killed(db_path, before, after, results):
+    """Cuenta como _counting_service pero informa los contadores en vivo antes de morir"""
+    storage.DB_PATH = db_path
+    counters = checkpoint.LiveCounters(CAMERA_ID)
+    checkpointer = checkpoint.Checkpointer(CAMERA_ID, counters.snapshot, 3600)
+    for person_id, action in before:
+        counters.record(person_id, action)
+    checkpointer.checkpoint_now()
+    for person_id, action in after:
+        counters.record(person_id, action)
+    results.put((counters.read(), counters.last_event_id))
+    time.sleep(3600)
+
+
+def _restore_service(db_path, results):
+    storage.DB_PATH = db_path
+    counters = checkpoint.LiveCounters(CAMERA_ID)
+    results.put((counters.read(), counters.last_event_id))
+
+
+def _crossings(first_id, count, exits):
+    events = [(first_id + i, "entered") for i in range(count)]
+    events += [(first_id + i, "exited") for i in range(exits)]
+    return events
+
+
+def _kill_and_restore(db_path, interval, before, after, wait_for_checkpoint):
+    ready = ctx.Event()
+    service = ctx.Process(target=_counting_service, args=(db_path, interval, before, after, ready))
+    service.start()
+    assert ready.wait(30), "el servicio no terminó de contar"
+    if wait_for_checkpoint:
+        deadline = time.time() + 10
+        while time.time() < deadline:
+            saved = storage.load_checkpoint(CAMERA_ID)
+            if saved and saved["last_event_id"] == _max_event_id(db_path):
+                break
+            time.sleep(0.02)
+        else:
+            pytest.fail("no se guardó el checkpoint periódico")
+    os.kill(service.pid, signal.SIGKILL)
+    service.join(10)
+    assert service.exitcode == -signal.SIGKILL
+
+    results = ctx.Queue()
+    restarted = ctx.Process(target=_restore_service, args=(db_path, results))
+    restarted.start()
+    restored = results.get(timeout=30)
+    restarted.join(10)
+    return restored
+
+
+def _max_event_id(db_path):
+    conn = sqlite3.connect(db_path)
+    max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+    conn.close()
+    return max_id
+
+
+def test_restore_after_sigkill(db_path):
+    events = _crossings(1, 20, 7)
+    counters, last_event_id = _kill_and_restore(db_path, 0.05, events, [], wait_for_checkpoint=True)
+
+    assert counters == {"inside": 13, "entered": 20, "exited": 7}
+    assert last_event_id == _max_event_id(db_path) == 27
+
+
+def test_events_after_last_checkpoint_are_replayed(db_path):
+    before = _crossings(1, 10, 4)
+    after = _crossings(100, 5, 3)
+    counters, last_event_id = _kill_and_restore(db_path, None, before, after, wait_for_checkpoint=False)
+
+    saved = storage.load_checkpoint(CAMERA_ID)
+    assert saved["counters"] == {"inside": 6, "entered": 10, "exited": 4}  # sólo la primera fase
+    assert counters == {"inside": 8, "entered": 15, "exited": 7}
+    assert last_event_id == _max_event_id(db_path) == 22
+
+
+def test_repeated_kills_keep_accumulating(db_path):
+    # Segundo reinicio: lo restaurado se sigue acumulando sin contar doble
+    _kill_and_restore(db_path, 0.05, _crossings(1, 3, 1), [], wait_for_checkpoint=True)
+    counters, last_event_id = _kill_and_restore(db_path, 0.05, _crossings(50, 2, 2), [], wait_for_checkpoint=True)
+
+    assert counters == {"inside": 2, "entered": 5, "exited": 3}
+    assert last_event_id == _max_event_id(db_path)
+
+
+def test_rejected_duplicates_match_between_live_and_restored(db_path):
+    # Tras un reinicio el tracker vuelve a numerar desde 1: la persona 1 sigue
+    # con sesión activa, así que su nueva "entrada" la descarta la BD.
+    before = _crossings(1, 3, 0)
+    after = [(1, "entered"), (2, "exited"), (2, "exited"), (9, "exited"), (4, "entered")]
+
+    live_results = ctx.Queue()
+    service = ctx.Process(target=_live_then_killed, args=(db_path, before, after, live_results))
+    service.start()
+    live = live_results.get(timeout=30)
+    os.kill(service.pid, signal.SIGKILL)
+    service.join(10)
+
+    # Cola nueva: el proceso matado pudo quedar con el lock de escritura de la anterior
+    results = ctx.Queue()
+    restarted = ctx.Process(target=_restore_service, args=(db_path, results))
+    restarted.start()
+    restored = results.get(timeout=30)
+    restarted.join(10)
+
+    assert live == restored
+    assert restored[0] == {"inside": 3, "entered": 4, "exited": 1}
+
+
+def test_bootstrap_counts_only_this_camera_sessions(db_path):
+    storage.save_event("entered", 1, "cam0")
+    storage.save_event("entered", 2, "cam1")
+    storage.save_event("entered", 3, "cam1")
+
+    assert checkpoint.LiveCounters("cam0").read()["inside"] == 1
+    assert checkpoint.LiveCounters("cam1").read()["inside"] == 2
@@ -0,0 +1,130 @@
+import os
+import time
+from datetime import datetime, timedelta
+import pytest
+from modules import storage
+from modules.clips import ClipBuffer, ClipWriter
+
+
+def frame(i, size=30):
+    return f"frame{i:03d}".encode().ljust(size, b".")
+
+
+def fill(buffer, count, size=30, start_time=1000.0):
+    for i in range(count):
+        buffer.append(frame(i, size), start_time + i)
+
+
+def payloads(frames):
+    return [data[:8].decode() for _, data in frames]
+
+
+# -----------------------------
+# ClipBuffer
+# -----------------------------
+def test_wrap_around_keeps_only_intact_frames():
+    buffer = ClipBuffer(100, 16)
+    fill(buffer, 4)  # el 4º no cabe al final: salta al inicio y pisa al 1º
+    assert buffer.positions[3] == 100
+    assert payloads(buffer.frames_between(0, 2000)) == ["frame001", "frame002", "frame003"]
+    assert buffer.stats()["buffered_frames"] == 3
+
+
+def test_frames_reserved_by_writer_are_discarded():
+    buffer = ClipBuffer(100, 16)
+    fill(buffer, 4)
+    # El escritor ya reservó la zona del siguiente frame (pisa al frame001)
+    buffer.reserved = buffer.head + 30
+    assert payloads(buffer.frames_between(0, 2000)) == ["frame002", "frame003"]
+
+
+def test_frame_larger_than_buffer_is_ignored():
+    buffer = ClipBuffer(100, 16)
+    buffer.append(b"x" * 101, 1.0)
+    assert buffer.count == 0 and buffer.frames_between(0, 10) == []
+
+
+def test_index_slots_wrap():
+    buffer = ClipBuffer(10_000, 4)
+    fill(buffer, 10)
+    frames = buffer.frames_between(0, 2000)
+    assert payloads(frames) == ["frame006", "frame007", "frame008", "frame009"]
+    assert [t for t, _ in frames] == [1006.0, 1007.0, 1008.0, 1009.0]
+
+
+# -----------------------------
+# ClipWriter
+# -----------------------------
+def test_request_drops_when_queue_is_full(tmp_path):
+    writer = ClipWriter("cam0", ClipBuffer(1000, 8), tmp_path, 1, 1, queue_size=2)
+    t0 = time.perf_counter()
+    for event_id in range(3):
+        writer.request(event_id, 0.0)
+    assert time.perf_counter() - t0 < 0.1
+    assert writer.dropped_requests == 1
+    assert writer.stats()["pending_requests"] == 2
+
+
+def test_clip_has_pre_and_post_roll_and_links_event(db_path, tmp_path):
+    event_id = storage.save_event("entered", 1, "cam0")
+    base = time.time() - 100
+    buffer = ClipBuffer(10_000, 64)
+    fill(buffer, 20, start_time=base)
+
+    writer = ClipWriter("cam0", buffer, tmp_path, pre_seconds=2, post_seconds=3, queue_size=4)
+    writer.start()
+    try:
+        writer.request(event_id, base + 10)  # el post-roll ya pasó: se escribe enseguida
+        deadline = time.time() + 5
+        while writer.clips_written == 0 and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        writer.stop()
+
+    clip_path = storage.get_event_clip(event_id)
+    day = datetime.fromtimestamp(base + 10).date().isoformat()
+    assert clip_path == os.path.join(tmp_path, "cam0", day, f"event_{event_id}.mjpeg")
+    with open(clip_path, "rb") as f:
+        assert f.read() == b"".join(frame(i) for i in range(8, 14))
+
+
+def _write_clip(root, day, event_id, size, mtime):
+    folder = root / "cam0" / day
+    folder.mkdir(parents=True, exist_ok=True)
+    path = folder / f"event_{event_id}.mjpeg"
+    path.write_bytes(b"x" * size)
+    os.utime(path, (mtime, mtime))
+    storage.set_event_clip(event_id, str(path))
+    return path
+
+
+@pytest.fixture
+def old_and_new_clips(db_path, tmp_path):
+    now = time.time()
+    ids = [storage.save_event("entered", person_id, "cam0") for person_id in range(3)]
+    old_day = (datetime.now() - timedelta(days=10)).date().isoformat()
+    today = datetime.now().date().isoformat()
+    paths = [
+        _write_clip(tmp_path, old_day, ids[0], 100, now - 10 * 86400),
+        _write_clip(tmp_path, today, ids[1], 100, now - 60),
+        _write_clip(tmp_path, today, ids[2], 100, now),
+    ]
+    return ids, paths
+
+
+def test_prune_removes_clips_older_than_retention(tmp_path, old_and_new_clips):
+    ids, paths = old_and_new_clips
+    writer = ClipWriter("cam0", ClipBuffer(1000, 8), tmp_path, 1, 1, 4, retention_days=7)
+    assert writer.prune() == 1
+    assert not paths[0].exists() and not paths[0].parent.exists()
+    assert storage.get_event_clip(ids[0]) is None
+    assert storage.get_event_clip(ids[1]) == str(paths[1])
+
+
+def test_prune_keeps_disk_usage_under_max_bytes(tmp_path, old_and_new_clips):
+    ids, paths = old_and_new_clips
+    writer = ClipWriter("cam0", ClipBuffer(1000, 8), tmp_path, 1, 1, 4, max_bytes=150)
+    assert writer.prune() == 2  # el más viejo y el anterior al último
+    assert [path.exists() for path in paths] == [False, False, True]
+    assert storage.get_event_clip(ids[2]) == str(paths[2])
+    assert writer.stats()["clips_pruned"] == 2
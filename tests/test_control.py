@@ -0,0 +1,69 @@
+import os
+import stat
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+import pytest
+from modules import control
+from config import WORKER_AUTHKEY_ENV
+
+
+@pytest.fixture
+def fresh_key(monkeypatch):
+    monkeypatch.setattr(control, "_authkey", None)
+    monkeypatch.delenv(WORKER_AUTHKEY_ENV, raising=False)
+
+
+def test_key_file_created_private_and_reused(tmp_path, fresh_key, monkeypatch):
+    path = tmp_path / "keys" / "worker.key"
+    key = control.load_authkey(path)
+    assert len(key) == 64
+    if os.name == "posix":
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+    # Otro proceso (API o worker) lee la misma clave
+    monkeypatch.setattr(control, "_authkey", None)
+    assert control.load_authkey(path) == key
+
+
+def test_key_files_differ_between_installations(tmp_path, fresh_key, monkeypatch):
+    first = control.load_authkey(tmp_path / "a.key")
+    monkeypatch.setattr(control, "_authkey", None)
+    assert control.load_authkey(tmp_path / "b.key") != first
+
+
+def test_env_key_takes_precedence(tmp_path, fresh_key, monkeypatch):
+    monkeypatch.setenv(WORKER_AUTHKEY_ENV, "clave-de-entorno")
+    assert control.load_authkey(tmp_path / "worker.key") == b"clave-de-entorno"
+    assert not (tmp_path / "worker.key").exists()
+
+
+@pytest.mark.skipif(os.name != "posix", reason="permisos POSIX")
+def test_rejects_key_file_readable_by_others(tmp_path, fresh_key):
+    path = tmp_path / "worker.key"
+    path.write_bytes(b"abc")
+    os.chmod(path, 0o644)
+    with pytest.raises(PermissionError):
+        control.load_authkey(path)
+
+
+def test_serve_rejects_clients_without_key():
+    key = b"clave-correcta"
+    listener = Listener(("127.0.0.1", 0), authkey=key)
+    received = []
+
+    def handler(message):
+        received.append(message)
+        return {"ok": True}
+
+    threading.Thread(target=control.serve, args=(listener, handler), daemon=True).start()
+
+    with pytest.raises(AuthenticationError):
+        with Client(listener.address, authkey=b"otra-clave") as conn:
+            conn.send({"cmd": "ping"})
+    assert received == []
+
+    with Client(listener.address, authkey=key) as conn:
+        conn.send({"cmd": "ping"})
+        assert conn.recv() == {"ok": True}
+    assert received == [{"cmd": "ping"}]
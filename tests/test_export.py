@@ -0,0 +1,143 @@
+import gzip
+import json
+import sqlite3
+from datetime import datetime, timedelta, timezone
+import pytest
+from modules import storage, export
+from config import DEFAULT_CAMERA_ID
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip", True),
+    ("gzip, deflate, br", True),
+    ("GZIP; q=0.5", True),
+    ("*", True),
+    ("", False),
+    ("deflate", False),
+    ("gzip;q=0", False),
+    ("gzip;q=0.0, deflate", False),
+    ("*;q=0", False),
+    ("gzip;q=0, *", False),
+])
+def test_accepts_gzip(header, expected):
+    assert export.accepts_gzip(header) is expected
+
+
+def test_ensure_schema_backfills_camera_id(tmp_path, monkeypatch):
+    # Base anterior a camera_id/clip_path, con eventos ya registrados
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE events (id INTEGER PRIMARY KEY AUTOINCREMENT, person_id INTEGER, action TEXT, timestamp TEXT)")
+    conn.executemany(
+        "INSERT INTO events (person_id, action, timestamp) VALUES (?, ?, ?)",
+        [(1, "entered", "2025-01-01T10:00:00"), (1, "exited", "2025-01-01T10:05:00")],
+    )
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(storage, "DB_PATH", path)
+    storage.init_db()
+
+    rows, _ = storage.query_events(camera_id=DEFAULT_CAMERA_ID)
+    assert [row["action"] for row in rows] == ["entered", "exited"]
+    assert all(row["camera_id"] == DEFAULT_CAMERA_ID for row in rows)
+
+
+def test_export_filters_by_camera(db_path):
+    storage.save_event("entered", 1, "cam0")
+    storage.save_event("entered", 2, "cam1")
+    body = b"".join(export.stream_events("csv", False, camera_id="cam1")).decode("utf-8")
+    lines = body.strip().splitlines()
+    assert lines[0] == ",".join(export.EXPORT_COLUMNS)
+    assert len(lines) == 2 and lines[1].endswith(",cam1")
+
+
+def _insert_events(db_path, timestamps, camera_id=DEFAULT_CAMERA_ID):
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO events (person_id, action, timestamp, camera_id) VALUES (?, ?, ?, ?)",
+        [(i, "entered", ts, camera_id) for i, ts in enumerate(timestamps)],
+    )
+    conn.commit()
+    conn.close()
+
+
+def _all_pages(limit, **filters):
+    pages, after = [], None
+    while True:
+        rows, last = storage.query_events(after=after, limit=limit, **filters)
+        pages.append([row["id"] for row in rows])
+        if last is None:
+            return pages
+        # El cursor viaja por la URL como texto opaco
+        after = export.decode_cursor(export.encode_cursor(last))
+
+
+def test_keyset_pagination_walks_every_row_once(db_path):
+    # Varias filas comparten timestamp: el id desempata dentro del cursor
+    timestamps = ["2025-01-01T10:00:00"] * 4 + ["2025-01-01T10:00:01"] * 3 + ["2025-01-01T09:59:59"]
+    _insert_events(db_path, timestamps)
+
+    pages = _all_pages(limit=3)
+    assert pages == [[8, 1, 2], [3, 4, 5], [6, 7]]
+
+
+def test_last_page_has_no_cursor(db_path):
+    _insert_events(db_path, ["2025-01-01T10:00:00"] * 4)
+    rows, last = storage.query_events(limit=4)
+    assert len(rows) == 4 and last is None
+    assert _all_pages(limit=2) == [[1, 2], [3, 4]]
+
+
+def test_pagination_respects_filters(db_path):
+    _insert_events(db_path, [f"2025-01-0{d}T12:00:00" for d in range(1, 6)])
+    start, end = export.parse_range("2025-01-02", "2025-01-04")
+    assert _all_pages(limit=2, start=start, end=end) == [[2, 3], [4]]
+
+
+@pytest.mark.parametrize("cursor", ["no-es-base64!", "c2luLWJhcnJh", export.encode_cursor(("x", 1))[:-4] + "@@@@"])
+def test_bad_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        export.decode_cursor(cursor)
+
+
+def test_parse_range_converts_offsets_to_local_naive():
+    start, end = export.parse_range("2025-01-01T10:00:00Z", "2025-01-01T12:00:00+00:00")
+    expected = datetime(2025, 1, 1, 10, tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+    assert start == expected.isoformat()
+    assert "+" not in end and not end.endswith("Z")
+    assert datetime.fromisoformat(end) - datetime.fromisoformat(start) == timedelta(hours=2)
+
+
+@pytest.mark.parametrize("fmt", ["csv", "ndjson"])
+def test_gzip_stream_matches_plain_output(db_path, fmt):
+    _insert_events(db_path, [f"2025-01-01T10:00:{s:02d}" for s in range(50)])
+    plain = b"".join(export.stream_events(fmt, False, chunk_size=7))
+    compressed = b"".join(export.stream_events(fmt, True, chunk_size=7))
+    assert gzip.decompress(compressed) == plain
+    if fmt == "csv":
+        assert plain.decode("utf-8").count("\n") == 51
+    else:
+        assert [json.loads(line)["id"] for line in plain.splitlines()] == list(range(1, 51))
+
+
+def test_migration_backfill_runs_only_once(tmp_path, monkeypatch):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE events (id INTEGER PRIMARY KEY AUTOINCREMENT, person_id INTEGER, action TEXT, timestamp TEXT)")
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(storage, "DB_PATH", path)
+    storage.init_db()
+
+    statements = []
+    connect = sqlite3.connect
+
+    def traced(*args, **kwargs):
+        conn = connect(*args, **kwargs)
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    monkeypatch.setattr(storage.sqlite3, "connect", traced)
+    storage.init_db()
+    assert not any(statement.startswith("UPDATE events") for statement in statements)
@@ -0,0 +1,161 @@
+from datetime import datetime
+import numpy as np
+import pytest
+from modules import storage, heatmap, export
+
+CAMERA_ID = "cam0"
+ROWS, COLS = 4, 4
+
+
+def _save_hour(bucket, entered=1, exited=0):
+    grid = np.ones((ROWS, COLS), dtype=np.uint32)
+    storage.save_traffic("hour", CAMERA_ID, bucket, entered, exited, heatmap.encode_grid(grid), ROWS, COLS)
+
+
+@pytest.fixture
+def hours(db_path):
+    for hour in range(9, 14):
+        _save_hour(f"2025-01-01T{hour:02d}", entered=hour)
+
+
+@pytest.mark.parametrize("start, end, expected", [
+    ("2025-01-01T10:00", "2025-01-01T12:00", ["2025-01-01T10", "2025-01-01T11"]),
+    ("2025-01-01T10:30", "2025-01-01T12:00", ["2025-01-01T10", "2025-01-01T11"]),
+    ("2025-01-01T10:00", "2025-01-01T11:15", ["2025-01-01T10", "2025-01-01T11"]),
+    ("2025-01-01T12:00", None, ["2025-01-01T12", "2025-01-01T13"]),
+    ("2025-01-01", "2025-01-01", [f"2025-01-01T{h:02d}" for h in range(9, 14)]),
+])
+def test_hourly_traffic_includes_overlapping_hours(hours, start, end, expected):
+    start, end = export.parse_range(start, end)
+    traffic = heatmap.load_hourly_traffic(CAMERA_ID, start, end)
+    assert [point["hour"] for point in traffic["hours"]] == expected
+    assert sum(bucket["entered"] for bucket in traffic["profile"]) == sum(int(h[-2:]) for h in expected)
+
+
+def test_heatmap_sums_every_hour_in_range(hours):
+    start, end = export.parse_range("2025-01-01T10:00", "2025-01-01T12:00")
+    grid, count = heatmap.load_heatmap(CAMERA_ID, start, end)
+    assert count == 2
+    assert grid.sum() == 2 * ROWS * COLS
+
+
+def test_heatmap_mixes_day_rollups_and_partial_hours(db_path):
+    # Día 1 completo como acumulado diario + 2 horas del día 2
+    day_grid = np.full((ROWS, COLS), 24, dtype=np.uint32)
+    storage.save_traffic("day", CAMERA_ID, "2025-01-01", 24, 0, heatmap.encode_grid(day_grid), ROWS, COLS)
+    for hour in ("2025-01-02T00", "2025-01-02T01", "2025-01-02T02"):
+        _save_hour(hour)
+
+    start, end = export.parse_range("2025-01-01", "2025-01-02T02:00")
+    grid, count = heatmap.load_heatmap(CAMERA_ID, start, end)
+    assert count == 3
+    assert grid.sum() == (24 + 2) * ROWS * COLS
+
+
+@pytest.mark.parametrize("start, end", [
+    ("2025-01-01T10:00:00Z", "2025-01-01T12:00:00Z"),
+    ("2025-01-01T10:00:00+00:00", "2025-01-01T12:00:00+00:00"),
+])
+def test_ranges_with_offset_do_not_crash(hours, start, end):
+    # Vía la API (parse_range) y llamando directo (analytics_section, scripts)
+    for bounds in (export.parse_range(start, end), (start, end)):
+        grid, count = heatmap.load_heatmap(CAMERA_ID, *bounds)
+        traffic = heatmap.load_hourly_traffic(CAMERA_ID, *bounds)
+        assert count == len(traffic["hours"]) <= 2
+
+
+# -----------------------------
+# HourlyAccumulator
+# -----------------------------
+class Clock:
+    def __init__(self, moment):
+        self.now = moment.timestamp()
+
+    def time(self):
+        return self.now
+
+    def set(self, moment):
+        self.now = moment.timestamp()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock(datetime(2025, 1, 1, 9, 10))
+    monkeypatch.setattr(heatmap, "time", clock)
+    return clock
+
+
+def _bucket(period, bucket):
+    rows = storage.get_traffic(period, CAMERA_ID, bucket, bucket + "~")
+    if not rows:
+        return None
+    _, _, entered, exited, blob, rows_, cols = rows[0]
+    return entered, exited, int(heatmap.decode_grid(blob, rows_, cols).sum())
+
+
+def _activity(accumulator, points, entered=0, exited=0):
+    for i in range(points):
+        accumulator.add_point(i % 64, i % 48, 64, 48)
+    for _ in range(entered):
+        accumulator.add_event("entered")
+    for _ in range(exited):
+        accumulator.add_event("exited")
+
+
+def test_hour_change_flushes_and_rolls_day(db_path, clock):
+    accumulator = heatmap.HourlyAccumulator(CAMERA_ID, ROWS, COLS, flush_seconds=3600)
+    _activity(accumulator, 5, entered=2)
+    clock.set(datetime(2025, 1, 1, 9, 59))
+    accumulator.tick()
+    assert _bucket("hour", "2025-01-01T09") is None  # todavía no toca persistir
+
+    clock.set(datetime(2025, 1, 1, 10, 0, 1))
+    accumulator.tick()
+    assert _bucket("hour", "2025-01-01T09") == (2, 0, 5)
+    assert accumulator.hour == "2025-01-01T10" and accumulator.grid.sum() == 0
+
+    _activity(accumulator, 3, exited=1)
+    accumulator.flush()
+    assert _bucket("hour", "2025-01-01T10") == (0, 1, 3)
+    assert _bucket("day", "2025-01-01") == (2, 1, 8)
+
+
+def test_periodic_flush(db_path, clock):
+    accumulator = heatmap.HourlyAccumulator(CAMERA_ID, ROWS, COLS, flush_seconds=60)
+    _activity(accumulator, 4, entered=1)
+    clock.set(datetime(2025, 1, 1, 9, 11, 1))
+    accumulator.tick()
+    assert _bucket("hour", "2025-01-01T09") == (1, 0, 4)
+
+
+def test_restart_mid_hour_continues_without_double_counting(db_path, clock):
+    first = heatmap.HourlyAccumulator(CAMERA_ID, ROWS, COLS, flush_seconds=3600)
+    _activity(first, 5, entered=2)  # hora 09 cerrada
+    clock.set(datetime(2025, 1, 1, 10, 5))
+    first.tick()
+    _activity(first, 3, entered=1)  # parte de la hora 10, guardada antes de morir
+    first.flush()
+
+    clock.set(datetime(2025, 1, 1, 10, 30))
+    restarted = heatmap.HourlyAccumulator(CAMERA_ID, ROWS, COLS, flush_seconds=3600)
+    assert (restarted.entered, int(restarted.grid.sum())) == (1, 3)
+    _activity(restarted, 4, exited=1)
+    restarted.flush()
+
+    assert _bucket("hour", "2025-01-01T10") == (1, 1, 7)
+    assert _bucket("day", "2025-01-01") == (3, 1, 12)
+
+
+def test_midnight_starts_a_new_day(db_path, clock):
+    clock.set(datetime(2025, 1, 1, 23, 50))
+    accumulator = heatmap.HourlyAccumulator(CAMERA_ID, ROWS, COLS, flush_seconds=3600)
+    _activity(accumulator, 6, entered=3)
+
+    clock.set(datetime(2025, 1, 2, 0, 0, 5))
+    accumulator.tick()
+    _activity(accumulator, 2, exited=2)
+    accumulator.flush()
+
+    assert _bucket("day", "2025-01-01") == (3, 0, 6)
+    assert _bucket("hour", "2025-01-02T00") == (0, 2, 2)
+    assert _bucket("day", "2025-01-02") == (0, 2, 2)
@@ -0,0 +1,71 @@
+import itertools
+import time
+import cv2
+import numpy as np
+import pytest
+from modules import renditions
+from modules.renditions import Rendition
+
+_ids = itertools.count()
+
+
+@pytest.fixture
+def make_rendition():
+    created = []
+
+    def _make(scale=0.25, quality=50, max_fps=None):
+        rendition = Rendition(f"rtest{next(_ids)}", "low", scale, quality, max_fps, 4, 64_000, idle_seconds=1)
+        created.append(rendition)
+        return rendition
+
+    yield _make
+    for rendition in created:
+        rendition.close()
+
+
+def _frame():
+    return (np.random.default_rng(0).random((480, 640, 3)) * 255).astype(np.uint8)
+
+
+def _decode(jpeg):
+    return cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def test_only_encodes_while_subscribed(make_rendition):
+    rendition = make_rendition()
+    rendition.offer(_frame(), time.time())
+    assert rendition.ring.latest_seq() == 0
+
+    rendition.ring.touch()  # un visor se suscribe
+    rendition.offer(_frame(), time.time())
+    seq, jpeg = rendition.ring.read()
+    assert seq == 1
+    assert _decode(jpeg).shape == (120, 160, 3)
+
+
+def test_max_fps_caps_encodes(make_rendition):
+    rendition = make_rendition(max_fps=2)
+    rendition.ring.touch()
+    now = time.time()
+    for i in range(20):
+        rendition.offer(_frame(), now + i * 0.05)  # 20 fps de entrada durante 1 s
+    assert rendition.ring.latest_seq() == 2
+
+
+def test_offline_frame_scaled_once_and_published(make_rendition, monkeypatch):
+    rendition = make_rendition()
+    renditions.offline_frame()  # el JPEG compartido ya existe (lo codifica camera.py una vez)
+    encodes = []
+    imencode = renditions.cv2.imencode
+    monkeypatch.setattr(renditions.cv2, "imencode", lambda *args: encodes.append(1) or imencode(*args))
+
+    rendition.offer_offline(time.time())
+    assert rendition.ring.latest_seq() == 0  # sin visores no se publica
+
+    rendition.ring.touch()
+    for _ in range(3):
+        rendition.offer_offline(time.time())
+    seq, jpeg = rendition.ring.read()
+    assert seq == 3
+    assert len(encodes) == 1
+    assert _decode(jpeg).shape == (120, 160, 3)
@@ -0,0 +1,31 @@
+import os
+import time
+import pytest
+from modules import control
+
+pytestmark = pytest.mark.skipif(os.name != "posix", reason="sesiones POSIX")
+
+
+def test_spawned_worker_is_detached(tmp_path, monkeypatch):
+    # worker.py falso: anota su pid y su sesión y queda vivo
+    report = tmp_path / "report.txt"
+    (tmp_path / "worker.py").write_text(
+        "import os, time\n"
+        f"open({str(report)!r}, 'w').write(f'{{os.getpid()}} {{os.getsid(0)}}')\n"
+        "time.sleep(30)\n"
+    )
+    monkeypatch.setattr(control, "BASE_DIR", tmp_path)
+
+    process = control.spawn_worker()
+    try:
+        deadline = time.time() + 10
+        while not report.exists() or not report.read_text():
+            assert time.time() < deadline, "el worker falso no arrancó"
+            time.sleep(0.02)
+        pid, sid = map(int, report.read_text().split())
+        assert pid == process.pid
+        # Sesión propia: no muere con el grupo de procesos de la API
+        assert sid == pid != os.getsid(0)
+    finally:
+        process.kill()
+        process.wait(5)
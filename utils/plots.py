@@ -0,0 +1,72 @@
+import io
+import cv2
+import numpy as np
+from reportlab.graphics.charts.barcharts import VerticalBarChart
+from reportlab.graphics.charts.legends import Legend
+from reportlab.graphics.shapes import Drawing
+from reportlab.lib import colors
+from reportlab.platypus import Image, Paragraph, Spacer
+from modules import heatmap
+
+
+def render_heatmap_png(grid: np.ndarray, width: int = 640, height: int = 480) -> bytes:
+    """
+    Convierte una grilla de ocupación en una imagen PNG coloreada.
+    Escala logarítmica para que las zonas de paso no opaquen al resto.
+    """
+    values = np.log1p(grid.astype(np.float32))
+    peak = values.max()
+    if peak > 0:
+        values = values / peak
+    image = cv2.resize((values * 255).astype(np.uint8), (width, height), interpolation=cv2.INTER_LINEAR)
+    image = cv2.applyColorMap(image, cv2.COLORMAP_JET)
+    _, buf = cv2.imencode(".png", image)
+    return buf.tobytes()
+
+
+def hourly_traffic_chart(profile, width: int = 450, height: int = 200) -> Drawing:
+    """Gráfico de barras de entradas y salidas por hora del día (reportlab)"""
+    drawing = Drawing(width, height)
+    chart = VerticalBarChart()
+    chart.x, chart.y = 30, 30
+    chart.width, chart.height = width - 60, height - 60
+    chart.data = [
+        [bucket["entered"] for bucket in profile],
+        [bucket["exited"] for bucket in profile],
+    ]
+    chart.categoryAxis.categoryNames = [f"{bucket['hour']:02d}" for bucket in profile]
+    chart.categoryAxis.labels.fontSize = 6
+    chart.valueAxis.valueMin = 0
+    chart.valueAxis.labels.fontSize = 7
+    chart.bars[0].fillColor = colors.green
+    chart.bars[1].fillColor = colors.red
+    drawing.add(chart)
+
+    legend = Legend()
+    legend.x, legend.y = width - 100, height - 10
+    legend.fontSize = 7
+    legend.colorNamePairs = [(colors.green, "Ingresos"), (colors.red, "Salidas")]
+    drawing.add(legend)
+    return drawing
+
+
+def analytics_section(start: str, end: str, normal_style, camera_id=None):
+    """
+    Flowables del reporte con el tráfico por hora y el mapa de calor del
+    rango [start, end), calculados desde los agregados horarios.
+    """
+    story = []
+    traffic = heatmap.load_hourly_traffic(camera_id, start, end)
+    if any(bucket["entered"] or bucket["exited"] for bucket in traffic["profile"]):
+        story.append(Spacer(1, 20))
+        story.append(Paragraph("Figura 1. Ingresos y salidas por hora del día", normal_style))
+        story.append(Spacer(1, 12))
+        story.append(hourly_traffic_chart(traffic["profile"]))
+
+    grid, _ = heatmap.load_heatmap(camera_id, start, end)
+    if grid is not None and grid.any():
+        story.append(Spacer(1, 20))
+        story.append(Paragraph("Figura 2. Mapa de calor de ocupación", normal_style))
+        story.append(Spacer(1, 12))
+        story.append(Image(io.BytesIO(render_heatmap_png(grid)), width=320, height=240))
+    return story
@@ -0,0 +1,84 @@
+"""
+Worker de visión: único proceso dueño de las cámaras, el modelo y los trackers.
+
+Publica frames y contadores en memoria compartida (modules.shared_state) y
+recibe comandos de la API por un canal IPC local (modules.control), de modo
+que cualquier número de procesos de la API pueda servir /video y /status.
+
+Uso:
+    python worker.py
+"""
+import os
+import signal
+import logging
+from logging.handlers import TimedRotatingFileHandler
+from modules import storage, control
+from config import CAMERAS
+
+LOG_DIR = "logs"
+LOG_FILE = os.path.join(LOG_DIR, "worker.log")
+
+logger = logging.getLogger("worker")
+
+
+def setup_logging():
+    os.makedirs(LOG_DIR, exist_ok=True)
+    handler = TimedRotatingFileHandler(
+        LOG_FILE, when="midnight", interval=1, backupCount=7, encoding="utf-8"
+    )
+    handler.setFormatter(logging.Formatter("%(asctime)s | %(levelname)s | %(name)s | %(message)s"))
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(handler)
+
+
+def _handle_sigterm(signum, frame):
+    raise SystemExit(0)
+
+
+def main():
+    setup_logging()
+
+    # El canal de control se abre primero: si el puerto está tomado ya hay
+    # un worker corriendo y este proceso termina sin cargar el modelo.
+    try:
+        listener = control.open_listener()
+    except OSError:
+        logger.info("ℹ️ Ya hay un worker corriendo; este proceso termina")
+        return
+
+    # Importado aquí para que la API pueda importar este módulo sin cargar YOLO
+    from modules.pipeline import CameraPipeline
+
+    storage.init_db()
+    pipelines = {camera_id: CameraPipeline(camera_id, source) for camera_id, source in CAMERAS.items()}
+    for pipeline in pipelines.values():
+        pipeline.start()
+    logger.info(f"🚀 Worker iniciado con cámaras: {list(pipelines)}")
+
+    def handle(message):
+        cmd = message.get("cmd")
+        if cmd == "ping":
+            return {"ok": True}
+        if cmd == "stats":
+            return {camera_id: pipeline.stats() for camera_id, pipeline in pipelines.items()}
+        pipeline = pipelines.get(message.get("camera_id"))
+        if pipeline is None:
+            return {"error": f"Cámara desconocida: {message.get('camera_id')}"}
+        if cmd == "toggle_camera":
+            return pipeline.toggle()
+        return {"error": f"Comando desconocido: {cmd}"}
+
+    signal.signal(signal.SIGTERM, _handle_sigterm)
+    try:
+        control.serve(listener, handle)
+    except (KeyboardInterrupt, SystemExit):
+        logger.info("🛑 Deteniendo worker")
+    finally:
+        listener.close()
+        for pipeline in pipelines.values():
+            pipeline.stop()
+
+
+if __name__ == "__main__":
+    main()